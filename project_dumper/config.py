@@ -1,11 +1,62 @@
 from __future__ import annotations
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields, replace
+from functools import lru_cache
 from typing import Literal
 from pathlib import Path
-import json
+import fnmatch, json, os, re, sys
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import msgspec
+except Exception:
+    msgspec = None
 
 RC_PATH = Path.home() / ".project_dumper.json"
 
+@lru_cache(maxsize=32)
+def _compile_globs(patterns: tuple[str, ...]) -> re.Pattern[str]:
+    # все fnmatch-паттерны сливаются в одну регулярку: один проход по имени вместо N вызовов fnmatch
+    if not patterns:
+        return re.compile(r"(?!)")
+    # fnmatch.fnmatch сравнивает с учётом os.path.normcase — повторяем это поведение
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns), flags)
+
+@lru_cache(maxsize=32)
+def _frozen(names: tuple[str, ...]) -> frozenset[str]:
+    return frozenset(names)
+
+def _interned(names) -> tuple[str, ...]:
+    return tuple(sys.intern(n) if isinstance(n, str) else n for n in names)
+
+# Умолчания — общие для всех экземпляров Config кортежи интернированных строк.
+_DEFAULT_IGNORE_DIRS: tuple[str, ...] = _interned((
+    ".git","__pycache__","node_modules",".venv","venv",".idea",".vscode",
+    ".mypy_cache",".pytest_cache",".tox","build","dist","target",".cache",
+    # прежнее место кеша дампа внутри проекта: такие каталоги могли остаться после старых версий
+    ".project_dumper",
+))
+_DEFAULT_IGNORE_FILES: tuple[str, ...] = _interned((
+    ".gitignore","*.png","*.jpg","*.jpeg","*.gif","*.webp","*.ico",
+    "*.pdf","*.zip","*.tar","*.gz","*.7z","*.rar",
+    "*.mp3","*.wav","*.ogg","*.flac",
+    "*.mov","*.mp4","*.avi","*.mkv",
+    "*.exe","*.dll","*.so","*.bin",
+    "*.otf","*.ttf","*.woff","*.woff2",
+    "*.pyc","*.pyo","*.class","*.o","*.a","*.dylib",
+    "*.sqlite*","*.db",
+))
+
+def _tuple_value(values, default: tuple[str, ...]) -> tuple[str, ...]:
+    # значение из RC, совпадающее с умолчанием, заменяем самим умолчанием:
+    # тот же объект — те же закешированные матчеры и множества
+    t = tuple(values)
+    return default if t == default else _interned(t)
+
 @dataclass(slots=True)
 class Config:
     ignore_hidden: bool = True
@@ -13,26 +64,17 @@ class Config:
     encoding: str = "utf-8"
     errors_policy: str = "replace"
     follow_symlinks: bool = False
-    ignore_dirs: tuple[str, ...] = (
-        ".git","__pycache__","node_modules",".venv","venv",".idea",".vscode",
-        ".mypy_cache",".pytest_cache",".tox","build","dist","target",".cache",
-    )
-    ignore_files: tuple[str, ...] = (
-        ".gitignore","*.png","*.jpg","*.jpeg","*.gif","*.webp","*.ico",
-        "*.pdf","*.zip","*.tar","*.gz","*.7z","*.rar",
-        "*.mp3","*.wav","*.ogg","*.flac",
-        "*.mov","*.mp4","*.avi","*.mkv",
-        "*.exe","*.dll","*.so","*.bin",
-        "*.otf","*.ttf","*.woff","*.woff2",
-        "*.pyc","*.pyo","*.class","*.o","*.a","*.dylib",
-        "*.sqlite*","*.db",
-    )
+    ignore_dirs: tuple[str, ...] = _DEFAULT_IGNORE_DIRS
+    ignore_files: tuple[str, ...] = _DEFAULT_IGNORE_FILES
     dirs_first_in_tree: bool = True
     binary_threshold: float = 0.30
     detect_encoding: bool = True
     output_format: str = "txt"  # txt|md|json
     theme: Literal["light", "dark"] = "light"        # light|dark
     include_collapsed_in_dump: bool = True
+    # кеш прочитанных файлов между запусками — в каталоге кешей пользователя (file_cache);
+    # выключен по умолчанию: туда попадает полный текст файлов проекта, включая секреты
+    dump_cache: bool = False
 
     # Diff settings
     # Модификатор, который должен быть зажат для копирования группы строк
@@ -41,19 +83,96 @@ class Config:
     diff_group_modifier: str = "Ctrl"
     # Длительность анимации подсветки копируемых строк (мс).
     diff_copy_flash_duration_ms: int = 300
+    # Подсветка диффа отключается, если в поле больше стольких символов
+    # (0 — без ограничения); включить её можно кнопкой «Подсветить всё равно».
+    diff_highlight_max_chars: int = 512 * 1024
+
+    # Скомпилированные матчеры кешируются по значению кортежа паттернов,
+    # поэтому присваивание нового ignore_files/ignore_dirs их сразу инвалидирует.
+    def compiled_file_matcher(self) -> re.Pattern[str]:
+        return _compile_globs(self.ignore_files)
+
+    def compiled_dir_matcher(self) -> re.Pattern[str]:
+        return _compile_globs(self.ignore_dirs)
+
+    def ignore_dirs_set(self) -> frozenset[str]:
+        return _frozen(self.ignore_dirs)
+
+    def is_file_ignored(self, name: str) -> bool:
+        return _compile_globs(self.ignore_files).match(name) is not None
+
+    def is_dir_ignored(self, name: str) -> bool:
+        # точное имя — через множество, маски — одной регуляркой
+        return name in _frozen(self.ignore_dirs) or _compile_globs(self.ignore_dirs).match(name) is not None
+
+def _build_loader():
+    # Загрузчик генерируется один раз при импорте по полям Config:
+    # прямые присваивания вместо hasattr/setattr по каждому ключу RC.
+    src = ["def _load(data, Config):", "    cfg = Config()"]
+    ns: dict[str, object] = {"_tuple_value": _tuple_value}
+    for f in fields(Config):
+        value = f"data[{f.name!r}]"
+        if str(f.type).startswith("tuple"):
+            ns[f"_default_{f.name}"] = f.default
+            value = f"_tuple_value({value}, _default_{f.name})"
+        src.append(f"    if {f.name!r} in data: cfg.{f.name} = {value}")
+    src.append("    return cfg")
+    exec("\n".join(src), ns)
+    return ns["_load"]
+
+_load = _build_loader()
+
+def _decode_typed(raw: bytes) -> Config | None:
+    # msgspec разбирает JSON сразу в Config по схеме полей; если RC не проходит
+    # валидацию типов (старый или вручную правленный файл) — None, и дальше
+    # работает снисходительный _load
+    if msgspec is None:
+        return None
+    try:
+        cfg = msgspec.json.decode(raw, type=Config)
+    except msgspec.ValidationError:
+        return None
+    cfg.ignore_dirs = _tuple_value(cfg.ignore_dirs, _DEFAULT_IGNORE_DIRS)
+    cfg.ignore_files = _tuple_value(cfg.ignore_files, _DEFAULT_IGNORE_FILES)
+    return cfg
+
+# (RC_PATH, mtime_ns, size) -> разобранный Config; повторные вызовы не перечитывают файл
+_rc_cache: tuple[tuple[Path, int, int], Config] | None = None
 
 def load_defaults() -> Config:
-    if RC_PATH.exists():
-        try:
-            data: dict[str, object] = json.loads(RC_PATH.read_text(encoding="utf-8"))
-            cfg = Config()
-            for k, v in data.items():
-                if hasattr(cfg, k):
-                    setattr(cfg, k, tuple(v) if k in ("ignore_dirs","ignore_files") else v)
-            return cfg
-        except Exception:
-            pass
-    return Config()
+    global _rc_cache
+    try:
+        st = RC_PATH.stat()
+    except OSError:
+        return Config()
+    key = (RC_PATH, st.st_mtime_ns, st.st_size)
+    if _rc_cache is not None and _rc_cache[0] == key:
+        return replace(_rc_cache[1])
+    try:
+        raw = RC_PATH.read_bytes()
+        cfg = _decode_typed(raw)
+        if cfg is None:
+            data: dict[str, object] = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
+            if not isinstance(data, dict):
+                raise ValueError("RC file must contain a JSON object")
+            cfg = _load(data, Config)
+    except Exception:
+        return Config()
+    _rc_cache = (key, cfg)
+    # отдаём копию: вызывающий код мутирует конфиг на месте
+    return replace(cfg)
 
 def save_defaults(cfg: Config) -> None:
-    RC_PATH.write_text(json.dumps(asdict(cfg), ensure_ascii=False, indent=2), encoding="utf-8")
+    global _rc_cache
+    _rc_cache = None
+    if msgspec is not None:
+        RC_PATH.write_bytes(msgspec.json.format(msgspec.json.encode(cfg), indent=2))
+        return
+    data = asdict(cfg)
+    if orjson is not None:
+        try:
+            RC_PATH.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            return
+        except orjson.JSONEncodeError:
+            pass
+    RC_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
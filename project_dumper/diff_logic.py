@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Iterable, List, Optional, Sequence, Set, Tuple, Union
 import re
 
 
@@ -17,10 +18,47 @@ class DiffLineType(Enum):
 
 
 _RE_HUNK_HEADER = re.compile(r"^(\s*@@.*?@@)")
-_RE_DIFF_HEADER = re.compile(r"^\s*diff\b")
-
-
-def detect_diff_block_indices(lines: Sequence[str]) -> Set[int]:
+# Пустой хедер целиком (для fullmatch): '@@' или '@@ @@' и только пробелы вокруг
+_RE_EMPTY_HUNK = re.compile(r"\s*@@\s*(?:@@)?\s*")
+_RE_EMPTY_HUNK_B = re.compile(rb"\s*@@\s*(?:@@)?\s*")
+# Всё, что strip_for_copy срезает с начала строки: служебный хедер @@...@@
+# или открытый '@@' без закрывающих (первым символом не может быть '+'/'-' —
+# \s* их не пропустит) плюс ещё один символ, либо просто первый символ строки.
+_RE_COPY_PREFIX = re.compile(r"(?:\s*@@(?:.*?@@)?)?(?s:.)?")
+# Ищут заголовки diff по всему буферу разом; [^\S\n] — пробельные символы, кроме перевода строки,
+# чтобы совпадение не перескакивало на предыдущие пустые строки. Применяются к "\n" + текст:
+# с литерального '\n' regex-движок сканирует заметно быстрее, чем с '^' в MULTILINE.
+_RE_DIFF_HEADER = re.compile(r"\n[^\S\n]*diff\b")
+# bytes-варианты для текста, который уже есть в виде байтов (ASCII-пробелы вместо юникодных)
+_RE_DIFF_HEADER_B = re.compile(rb"\n[^\S\n]*diff\b")
+# Строки, которые после ведущих пробелов начинаются с '@@' (для classify_all), тоже по "\n" + текст
+_RE_AT_LINE = re.compile(r"\n[^\S\n]*@@[^\n]*")
+
+
+def _iter_diff_header_lines(text: Union[str, bytes]) -> Iterable[int]:
+    """Номера строк text (разделитель '\n'), где начинается заголовок diff."""
+    if isinstance(text, bytes):
+        regex, nl = _RE_DIFF_HEADER_B, b"\n"
+    else:
+        regex, nl = _RE_DIFF_HEADER, "\n"
+    # совпадение начинается с '\n' перед строкой: число '\n' до него и есть её номер
+    text = nl + text
+    line_no = 0
+    pos = 0
+    for m in regex.finditer(text):
+        start = m.start()
+        line_no += text.count(nl, pos, start)
+        pos = start
+        yield line_no
+
+
+def _join_lines(lines: Union[str, Sequence[str]]) -> Tuple[str, int]:
+    if isinstance(lines, str):
+        return lines, lines.count("\n") + 1
+    return "\n".join(lines), len(lines)
+
+
+def detect_diff_block_indices(lines: Union[str, Sequence[str]]) -> Set[int]:
     """
     Найти индексы строк, относящихся к блокам заголовков diff.
 
@@ -30,25 +68,65 @@ def detect_diff_block_indices(lines: Sequence[str]) -> Set[int]:
     - Эта строка ВСЕГДА серая.
     - Далее БЕЗУСЛОВНО берём максимум следующие три строки (если они существуют)
       и тоже считаем их частью серого блока — независимо от содержимого.
+
+    Принимает либо список строк (без '\n' внутри, как после splitlines()),
+    либо сам текст — тогда строки считаются разделёнными '\n'.
+    Поиск идёт одним regex-проходом по всему буферу; номер строки для
+    каждого совпадения получается подсчётом '\n' от предыдущего совпадения.
     """
+    text, n = _join_lines(lines)
     result: Set[int] = set()
-    n = len(lines)
-    i = 0
-    while i < n:
-        line = lines[i]
-        if _RE_DIFF_HEADER.match(line):
-            # сама строка с diff всегда в блоке
-            result.add(i)
-            # следующие до трёх строк — всегда, независимо от содержимого
-            for k in range(1, 4):
-                j = i + k
-                if j >= n:
-                    break
-                result.add(j)
-        i += 1
+    for i in _iter_diff_header_lines(text):
+        # сама строка с diff и следующие до трёх строк — всегда, независимо от содержимого
+        result.update(range(i, min(i + 4, n)))
     return result
 
 
+def detect_diff_block_bitmap(lines: Union[str, Sequence[str]]) -> bytearray:
+    """
+    То же, что detect_diff_block_indices, но в виде битовой карты:
+    bm[i] == 1, если строка i входит в блок заголовка diff.
+
+    Один байт на строку вместо int в set, проверка — обычная индексация
+    без хеширования. Длина карты равна числу строк.
+    """
+    text, n = _join_lines(lines)
+    return _bitmap_from_text(text, n)
+
+
+def diff_header_rows(lines: Union[str, Sequence[str]]) -> bytearray:
+    """
+    Битовая карта строк, с которых начинается заголовок diff (без трёх строк после него).
+
+    Блок заголовка для строки i целиком определяется строками i-3..i, поэтому
+    по этой карте блоки можно пересчитывать локально, вокруг изменённых строк.
+    """
+    text, n = _join_lines(lines)
+    rows = bytearray(n)
+    for i in _iter_diff_header_lines(text):
+        rows[i] = 1
+    return rows
+
+
+def _bitmap_from_text(text: Union[str, bytes], n: int) -> bytearray:
+    bm = bytearray(n)
+    for i in _iter_diff_header_lines(text):
+        end = min(i + 4, n)
+        bm[i:end] = b"\x01" * (end - i)
+    return bm
+
+
+def detect_diff_block_bitmap_bytes(buf: bytes) -> bytearray:
+    """
+    detect_diff_block_bitmap для текста в байтах (строки разделены b'\n').
+
+    Для вызывающих, у которых дифф уже лежит в bytes (например, прочитан
+    из файла): без декодирования в str, regex работает в bytes-режиме.
+    Пробелы перед 'diff' — только ASCII.
+    """
+    return _bitmap_from_text(buf, buf.count(b"\n") + 1)
+
+
 def find_hunk_header_prefix(line: str) -> Optional[slice]:
     """
     Найти префикс '@@ ... @@' в начале строки (с учётом ведущих пробелов/табов).
@@ -67,9 +145,44 @@ def find_hunk_header_prefix(line: str) -> Optional[slice]:
         return None
     return slice(m.start(1), m.end(1))
 
+def _span_full(line: str) -> Optional[Tuple[int, int]]:
+    return (0, len(line))
+
+def _span_hunk(line: str) -> Optional[Tuple[int, int]]:
+    m = _RE_HUNK_HEADER.match(line)
+    return (m.start(1), m.end(1) - m.start(1)) if m else None
+
+def _span_other(line: str) -> Optional[Tuple[int, int]]:
+    stripped = line.lstrip()
+    if stripped.startswith("@@") and stripped.find("@@", 2) == -1 and line[:1] not in ("+", "-"):
+        return (len(line) - len(stripped), 2)
+    return None
+
+# тип строки -> функция участка подсветки: один поиск в словаре вместо цепочки if
+_SPAN_BY_TYPE = {
+    DiffLineType.HEADER_DIFF: _span_full,
+    DiffLineType.HEADER_HUNK_EMPTY: _span_full,
+    DiffLineType.PLUS: _span_full,
+    DiffLineType.MINUS: _span_full,
+    DiffLineType.HEADER_HUNK: _span_hunk,
+    DiffLineType.OTHER: _span_other,
+}
+
+def highlight_span(line: str, line_type: DiffLineType) -> Optional[Tuple[int, int]]:
+    """
+    Участок строки (начало, длина), который подсвечивается цветом её типа, либо None.
+
+      HEADER_DIFF, HEADER_HUNK_EMPTY, PLUS, MINUS — вся строка;
+      HEADER_HUNK — префикс '@@ ... @@' (см. find_hunk_header_prefix);
+      OTHER — только первые '@@' открытого хедера без закрывающих '@@',
+              у остальных строк подсветки нет.
+    """
+    return _SPAN_BY_TYPE[line_type](line)
+
+
 def _is_empty_hunk_header(line: str) -> bool:
     """
-    Пустой хедер '@@ ... @@' без текста между парами собачек.
+    Пустой хедер '@@ ... @@' без текста между парами собачек и после них.
 
     Примеры пустых:
       "@@"
@@ -78,19 +191,10 @@ def _is_empty_hunk_header(line: str) -> bool:
 
     Непустые:
       "@@ -1,3 +1,4 @@"
+      "@@ @@ text"
+      "@@ text"  (открытый хедер без закрывающих '@@')
     """
-    stripped = line.lstrip()
-    if not stripped.startswith("@@"):
-        return False
-
-    rest = stripped[2:]
-    second_pos = rest.find("@@")
-    if second_pos == -1:
-        # только одна пара "@@" и больше ничего — тоже считаем пустым
-        return True
-
-    inner = rest[:second_pos]
-    return inner.strip() == ""
+    return _RE_EMPTY_HUNK.fullmatch(line) is not None
 
 def strip_for_copy(line: str) -> str:
     """
@@ -99,7 +203,8 @@ def strip_for_copy(line: str) -> str:
     Алгоритм:
     1) Если строка НЕ начинается с '+' или '-' (первый символ),
        пробуем удалить префикс вида '  @@ ... @@' в начале строки,
-       включая ведущие пробелы/табы.
+       включая ведущие пробелы/табы; у открытого хедера без закрывающих
+       '@@' срезаются только первые '@@'.
     2) После этого удаляем ПЕРВЫЙ символ оставшейся строки (если он есть).
 
     Примеры:
@@ -107,28 +212,63 @@ def strip_for_copy(line: str) -> str:
       '+@@ -1,3 @@ foo'  -> '@@ -1,3 @@ foo'  (@@ не служебный, т.к. после '+')
       '@@ -1,3 @@ foo'   -> 'foo'
       '  @@ -1,3 @@ bar' -> 'bar'
+      '@@ text'          -> 'text'
       ''                 -> ''
     """
     # Пустые хедеры @@...@@ не копируем вообще
     if _is_empty_hunk_header(line):
         return ""
 
-    s = line
+    # Шаги 1–2 одним match: хедер @@ (только если первый символ не '+'/'-')
+    # и следующий за ним первый символ оставшейся строки.
+    return line[_RE_COPY_PREFIX.match(line).end():]
+
+
+def strip_for_copy_many(lines: Sequence[str]) -> List[str]:
+    """strip_for_copy для набора строк (групповое копирование)."""
+    empty = _is_empty_hunk_header
+    match = _RE_COPY_PREFIX.match
+    return ["" if empty(line) else line[match(line).end():] for line in lines]
 
-    # Шаг 1: служебный хедер@@ в начале строки, только если первый символ
-    # НЕ '+' и НЕ '-'. В противном случае @@ считаем обычным текстом.
-    if s and s[0] not in {"+", "-"}:
-        sl = find_hunk_header_prefix(s)
-        if sl is not None and sl.start == 0:
-            s = s[sl.stop :]
 
-    # Шаг 2: удалить первый символ оставшейся строки
-    if s:
-        s = s[1:]
-    return s
+# Коды первых символов для first_chars: всё, что не образует групп, — 0.
+_FIRST_CODES = {"+": ord("+"), "-": ord("-"), " ": ord(" "), "\t": ord(" ")}
+# Для каждого кода группы — остальные возможные коды (границы группы).
+_GROUP_BOUNDS = {
+    code: tuple(bytes([o]) for o in {0, *_FIRST_CODES.values()} if o != code)
+    for code in set(_FIRST_CODES.values())
+}
 
 
-def get_group_indices(lines: Sequence[str], index: int) -> List[int]:
+def first_chars(lines: Sequence[str]) -> bytes:
+    """
+    Первые символы строк в виде bytes (по байту на строку) для get_group_indices.
+
+    '+' и '-' кодируются своими ASCII-кодами, пробел и таб — одним кодом
+    пробела (для контекстных групп они равнозначны), всё остальное,
+    включая пустые строки, — 0. Считается один раз на каждый новый текст.
+    """
+    codes = _FIRST_CODES
+    return bytes(codes.get(line[:1], 0) for line in lines)
+
+
+def _group_from_firsts(firsts: bytes, index: int) -> List[int]:
+    code = firsts[index]
+    if not code:
+        return [index]
+    # Границы группы ищем C-уровневыми find/rfind по остальным кодам,
+    # вместо посимвольного цикла по строкам в обе стороны.
+    bounds = _GROUP_BOUNDS[code]
+    start = max(firsts.rfind(b, 0, index) for b in bounds) + 1
+    end = len(firsts)
+    for b in bounds:
+        pos = firsts.find(b, index + 1)
+        if pos != -1 and pos < end:
+            end = pos
+    return list(range(start, end))
+
+
+def get_group_indices(lines: Sequence[str], index: int, firsts: Optional[bytes] = None) -> List[int]:
     """
     Найти группу строк для копирования при зажатом модификаторе (Ctrl/Shift и т. п.).
 
@@ -140,10 +280,16 @@ def get_group_indices(lines: Sequence[str], index: int) -> List[int]:
         берём максимально широкий блок подряд идущих строк, у которых
         первый символ тоже пробел или таб (искусственный контекстный блок).
     - Во всех остальных случаях: возвращаем только [index].
+
+    firsts — необязательный результат first_chars(lines) для того же списка
+    строк; с ним поиск границ группы идёт по bytes без Python-цикла.
     """
     if index < 0 or index >= len(lines):
         return []
 
+    if firsts is not None:
+        return _group_from_firsts(firsts, index)
+
     line = lines[index]
     if not line:
         return [index]
@@ -193,33 +339,171 @@ def get_group_indices(lines: Sequence[str], index: int) -> List[int]:
 def classify_line(
     lines: Sequence[str],
     index: int,
-    diff_block_indices: Set[int],
+    diff_block_indices: Union[Set[int], bytearray],
 ) -> DiffLineType:
     """
     Определить тип строки для подсветки.
 
     Приоритет:
-      1) Если индекс входит в diff_block_indices -> HEADER_DIFF.
-      2) Если (после ведущих пробелов) строка начинается с '@@' -> HEADER_HUNK.
+      1) Если индекс входит в diff_block_indices (set индексов или битовая
+         карта из detect_diff_block_bitmap) -> HEADER_DIFF.
+      2) Если (после ведущих пробелов) строка начинается с '@@':
+         пустой хедер -> HEADER_HUNK_EMPTY, есть закрывающие '@@' -> HEADER_HUNK,
+         открытый хедер без закрывающих -> OTHER.
       3) Если первый символ '+' -> PLUS.
       4) Если первый символ '-' -> MINUS.
       5) Иначе -> OTHER.
     """
+    # O(1)-проверка блока diff — первой
+    if isinstance(diff_block_indices, bytearray):
+        if 0 <= index < len(diff_block_indices) and diff_block_indices[index]:
+            return DiffLineType.HEADER_DIFF
+    elif index in diff_block_indices:
+        return DiffLineType.HEADER_DIFF
+
     if index < 0 or index >= len(lines):
         return DiffLineType.OTHER
 
-    if index in diff_block_indices:
-        return DiffLineType.HEADER_DIFF
-
     line = lines[index]
-    # сначала проверяем "пустой" хедер @@...@@ без содержания
-    if _is_empty_hunk_header(line):
-        return DiffLineType.HEADER_HUNK_EMPTY
-    if _RE_HUNK_HEADER.match(line):
-        return DiffLineType.HEADER_HUNK
-
-    if line.startswith("+"):
+    # Быстрый путь: строки изменений. Строка с '+'/'-' в начале не может быть
+    # хедером '@@' (lstrip не снимает эти символы), так что порядок проверок
+    # с исходными правилами не расходится.
+    ch0 = line[:1]
+    if ch0 == "+":
         return DiffLineType.PLUS
-    if line.startswith("-"):
+    if ch0 == "-":
         return DiffLineType.MINUS
-    return DiffLineType.OTHER
+
+    stripped = line.lstrip()
+    if not stripped.startswith("@@"):
+        return DiffLineType.OTHER
+    if _RE_EMPTY_HUNK.fullmatch(stripped):
+        return DiffLineType.HEADER_HUNK_EMPTY
+    # открытый хедер без закрывающих '@@' — OTHER, первые '@@' подсвечивает сам highlighter
+    if stripped.find("@@", 2) == -1:
+        return DiffLineType.OTHER
+    return DiffLineType.HEADER_HUNK
+
+
+def classify_lines_bytes(buf: bytes) -> List[DiffLineType]:
+    """
+    classify_line для всех строк текста в байтах (строки разделены b'\n').
+
+    Правила те же; маркеры '+', '-', '@@' и 'diff' — ASCII, поэтому
+    UTF-8 и прочие ASCII-совместимые кодировки можно не декодировать.
+    Ведущие пробелы понимаются в смысле ASCII.
+    """
+    bm = detect_diff_block_bitmap_bytes(buf)
+    out: List[DiffLineType] = []
+    append = out.append
+    for i, line in enumerate(buf.split(b"\n")):
+        if bm[i]:
+            append(DiffLineType.HEADER_DIFF)
+            continue
+        ch0 = line[:1]
+        if ch0 == b"+":
+            append(DiffLineType.PLUS)
+            continue
+        if ch0 == b"-":
+            append(DiffLineType.MINUS)
+            continue
+        stripped = line.lstrip()
+        if not stripped.startswith(b"@@"):
+            append(DiffLineType.OTHER)
+        elif _RE_EMPTY_HUNK_B.fullmatch(stripped):
+            append(DiffLineType.HEADER_HUNK_EMPTY)
+        elif stripped.find(b"@@", 2) == -1:
+            append(DiffLineType.OTHER)
+        else:
+            append(DiffLineType.HEADER_HUNK)
+    return out
+
+
+# first_chars-код -> тип строки без учёта '@@' и блоков diff (таблица на все 256 кодов)
+_TYPE_BY_FIRST = tuple(
+    DiffLineType.PLUS if c == ord("+") else DiffLineType.MINUS if c == ord("-") else DiffLineType.OTHER
+    for c in range(256)
+)
+
+
+def _classify_text(text: str, firsts: bytes) -> Tuple[List[DiffLineType], List[int]]:
+    # общая часть classify_all и DiffModel.from_lines: типы строк и номера '@@'-строк
+    types = list(map(_TYPE_BY_FIRST.__getitem__, firsts))
+    at_rows: List[int] = []
+    empty = _RE_EMPTY_HUNK.fullmatch
+    nl_text = "\n" + text
+    line_no = 0
+    pos = 0
+    # строк с '@@' немного: ищем их regex-проходом по всему тексту, номер — подсчётом '\n'
+    for m in _RE_AT_LINE.finditer(nl_text):
+        start = m.start()
+        line_no += nl_text.count("\n", pos, start)
+        pos = start
+        stripped = m.group()[1:].lstrip()
+        if empty(stripped):
+            types[line_no] = DiffLineType.HEADER_HUNK_EMPTY
+        elif stripped.find("@@", 2) != -1:
+            types[line_no] = DiffLineType.HEADER_HUNK
+        at_rows.append(line_no)
+    header = DiffLineType.HEADER_DIFF
+    n = len(types)
+    for i in _iter_diff_header_lines(text):
+        end = min(i + 4, n)
+        types[i:end] = [header] * (end - i)
+    return types, at_rows
+
+
+def classify_all(lines: Sequence[str]) -> List[DiffLineType]:
+    """
+    classify_line для всех строк сразу.
+
+    Построчно в Python смотрится только первый символ; строки с '@@' и
+    заголовки diff находятся regex-проходами по склеенному тексту, так что
+    интерпретатор работает лишь с ними, а не со всеми строками.
+    """
+    text, _ = _join_lines(lines)
+    return _classify_text(text, first_chars(lines))[0]
+
+
+@dataclass
+class DiffModel:
+    """
+    Разобранный дифф: тип строки, подсвечиваемый участок (highlight_span),
+    текст для копирования и first_chars — всё считается одним проходом
+    по строкам при сканировании.
+
+    Дальше подсветка и копирование только читают готовые значения по индексу.
+    """
+
+    lines: List[str] = field(default_factory=list)
+    types: List[DiffLineType] = field(default_factory=list)
+    copies: List[str] = field(default_factory=list)
+    firsts: bytes = b""
+    spans: List[Optional[Tuple[int, int]]] = field(default_factory=list)
+
+    @classmethod
+    def from_lines(cls, lines: Sequence[str]) -> "DiffModel":
+        lines = list(lines)
+        text, _ = _join_lines(lines)
+        firsts = first_chars(lines)
+        types, at_rows = _classify_text(text, firsts)
+        # по умолчанию копия — строка без первого символа, подсветка — вся строка
+        # (у OTHER её нет); строки с '@@' дальше поправляются по одной
+        other = DiffLineType.OTHER
+        copies = [line[1:] for line in lines]
+        spans: List[Optional[Tuple[int, int]]] = [
+            None if t is other else (0, len(line)) for line, t in zip(lines, types)
+        ]
+        copy_prefix = _RE_COPY_PREFIX.match
+        for i in at_rows:
+            line = lines[i]
+            # блок diff важнее типа строки, но на копирование не влияет
+            if _RE_EMPTY_HUNK.fullmatch(line.lstrip()):
+                copies[i] = ""
+            else:
+                copies[i] = line[copy_prefix(line).end():]
+            spans[i] = highlight_span(line, types[i])
+        return cls(lines, types, copies, firsts, spans)
+
+    def group_indices(self, index: int) -> List[int]:
+        return get_group_indices(self.lines, index, self.firsts)
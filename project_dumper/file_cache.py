@@ -0,0 +1,148 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Optional
+import hashlib, json, os, threading
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+from .config import Config
+
+_VERSION = 1
+
+def user_cache_dir() -> Path:
+    # кеши лежат у пользователя, в сканируемый проект ничего не пишется
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base and os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA")
+    return (Path(base) if base else Path.home() / ".cache") / "project_dumper"
+
+# файлы крупнее в кеш не кладём: их текст пришлось бы держать в памяти целиком
+_MAX_CACHED_SIZE = 4 * 1024 * 1024
+# текста одного корня сохраняем не больше (в символах), остальное читается заново
+_MAX_ROOT_TEXT = 64 * 1024 * 1024
+# каталог кешей общий для всех корней: не больше стольких файлов и байт, старые удаляются
+_MAX_ROOTS = 16
+_MAX_TOTAL_SIZE = 256 * 1024 * 1024
+
+def _evict(cache_dir: Path, keep: Path) -> None:
+    # LRU по mtime: save() обновляет mtime файла своего корня, keep не удаляется
+    entries: list[tuple[int, int, str]] = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for e in it:
+                if e.name.endswith(".json") and e.name != keep.name:
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, e.path))
+        total = keep.stat().st_size
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    count = 1
+    for _, size, path in entries:
+        if count < _MAX_ROOTS and total + size <= _MAX_TOTAL_SIZE:
+            count += 1
+            total += size
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def reader_key(cfg: Config) -> list:
+    # настройки, от которых зависит текст, выдаваемый read_text_streaming
+    return [cfg.max_file_size, cfg.encoding, cfg.errors_policy, cfg.binary_threshold, cfg.detect_encoding]
+
+class FileCache:
+    """
+    Прочитанный текст файлов между запусками: <user_cache_dir>/<хеш корня>.json.
+
+    Запись файла действительна, пока у него те же (st_mtime_ns, st_size) и те же
+    настройки чтения (reader_key). get/put можно звать из потока сканирования;
+    save() оставляет только записи, затронутые с последнего load() (не больше
+    _MAX_ROOT_TEXT символов текста), пишет файл атомарно — через временный файл
+    и os.replace — и вытесняет кеши давно не сканированных корней.
+    """
+
+    def __init__(self, root: Path, cache_dir: Path | None = None) -> None:
+        self.root = root
+        self._root_key = os.path.abspath(root)
+        digest = hashlib.sha1(os.fsencode(self._root_key)).hexdigest()[:16]
+        self.path = (cache_dir or user_cache_dir()) / f"{digest}.json"
+        self._lock = threading.Lock()
+        self._settings: list | None = None
+        # rel -> [mtime_ns, size, текст]
+        self._files: dict[str, list] = {}
+        self._seen: set[str] = set()
+        self._loaded = False
+        self._dirty = False
+
+    def load(self, settings: list) -> None:
+        # с диска читается один раз; смена настроек чтения обнуляет записи
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                try:
+                    raw = self.path.read_bytes()
+                    data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
+                    if (isinstance(data, dict) and data.get("version") == _VERSION
+                            and data.get("root") == self._root_key and isinstance(data.get("files"), dict)):
+                        self._settings = data.get("settings")
+                        self._files = data["files"]
+                except Exception:
+                    pass
+            if self._settings != settings:
+                self._settings = settings
+                self._files = {}
+                self._dirty = True
+            self._seen = set()
+
+    def get(self, rel: str, mtime_ns: int, size: int) -> Optional[str]:
+        # под блокировкой, как put: брошенный поток отменённого запуска может ещё
+        # обращаться к тому же кешу, пока новый запуск делает load()
+        with self._lock:
+            entry = self._files.get(rel)
+            self._seen.add(rel)
+        if entry is not None and entry[0] == mtime_ns and entry[1] == size:
+            return entry[2]
+        return None
+
+    def put(self, rel: str, mtime_ns: int, size: int, text: str) -> None:
+        if size > _MAX_CACHED_SIZE:
+            return
+        with self._lock:
+            self._files[rel] = [mtime_ns, size, text]
+            self._seen.add(rel)
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._seen.issuperset(self._files):
+                # исчезнувшие и отфильтрованные файлы выпадают
+                self._files = {k: v for k, v in self._files.items() if k in self._seen}
+                self._dirty = True
+            if not self._dirty:
+                return
+            files: dict[str, list] = {}
+            total = 0
+            for rel, entry in self._files.items():
+                total += len(entry[2])
+                if total > _MAX_ROOT_TEXT:
+                    break
+                files[rel] = entry
+            data = {"version": _VERSION, "root": self._root_key, "settings": self._settings, "files": files}
+            self._dirty = False
+        try:
+            raw = orjson.dumps(data) if orjson is not None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(raw)
+            os.replace(tmp, self.path)
+        except OSError:
+            return  # каталог кешей недоступен — работаем без кеша на диске
+        _evict(self.path.parent, self.path)
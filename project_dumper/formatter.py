@@ -1,16 +1,46 @@
 from __future__ import annotations
 import io, json
+from collections import deque
 from typing import Any
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 SEP = "====="
 
+# Буферы закрытых DumpBuilder: при частой пересборке дампа переиспользуем
+# объекты StringIO вместо новых. pop/append у deque атомарны, блокировка не нужна.
+_STRINGIO_POOL: deque[io.StringIO] = deque(maxlen=8)
+
+def _take_buffer() -> io.StringIO:
+    try:
+        buf = _STRINGIO_POOL.pop()
+    except IndexError:
+        return io.StringIO()
+    buf.seek(0)
+    buf.truncate(0)
+    return buf
+
 class DumpBuilder:
     def __init__(self, mode: str = "txt"):
         self.mode = mode
         if mode == "json":
             self.obj = {"tree": "", "files": []}
+            # содержимое текущего файла копим кусками и склеиваем один раз в end_file
+            self._cur_chunks: list[str] = []
+            # горячие методы привязываем к режиму один раз: без ветвления на каждый кусок;
+            # add_chunk(s), add_chunks(chunks) — пачка кусков одного файла, end_file(is_last)
+            self.add_chunk = self._cur_chunks.append
+            self.add_chunks = self._cur_chunks.extend
+            self.end_file = self._end_file_json
         else:
-            self.buf = io.StringIO()
+            self.buf = _take_buffer()
+            self._drained = 0  # позиция в buf, до которой текст уже отдан через drain()
+            self.add_chunk = self.buf.write
+            self.add_chunks = self.buf.writelines
+            self.end_file = self._end_file_text
         # новый флаг: был ли уже выведен хоть один включённый файл
         self._has_any_file = False
 
@@ -28,6 +58,7 @@ class DumpBuilder:
 
     def start_file(self, relpath: str):
         if self.mode == "json":
+            self._flush_json_content()
             self._cur = {"path": relpath, "content": ""}
             self.obj["files"].append(self._cur)
         else:
@@ -40,17 +71,61 @@ class DumpBuilder:
             else:
                 self.buf.write(relpath + "\n\n")
 
-    def add_chunk(self, s: str):
-        if self.mode == "json":
-            self._cur["content"] += s
-        else:
-            self.buf.write(s)
+    def _flush_json_content(self) -> None:
+        if self._cur_chunks:
+            self._cur["content"] += "".join(self._cur_chunks)
+            self._cur_chunks.clear()
 
-    def end_file(self, is_last: bool):
-        if self.mode in ("md","txt"):
-            self.buf.write("\n\n")
+    def _end_file_json(self, is_last: bool):
+        self._flush_json_content()
+
+    def _end_file_text(self, is_last: bool):
+        self.buf.write("\n\n")
 
     def build(self) -> str:
         if self.mode == "json":
+            self._flush_json_content()
+            if orjson is not None:
+                try:
+                    # C-энкодер; вывод совпадает с json.dumps(ensure_ascii=False, indent=2)
+                    return orjson.dumps(self.obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+                except orjson.JSONEncodeError:
+                    # например, суррогаты в именах файлов — с ними справится только stdlib
+                    pass
             return json.dumps(self.obj, ensure_ascii=False, indent=2)
         return self.buf.getvalue()
+
+    def drain(self, limit: int | None = None) -> str:
+        """
+        Текст, дописанный с прошлого вызова drain() (только txt/md); не больше
+        limit символов, если он задан — остаток вернут следующие вызовы.
+
+        Позволяет показывать дамп по мере сборки, не копируя весь буфер.
+        Для json возвращает "": документ валиден только целиком, после build().
+        """
+        if self.mode == "json":
+            return ""
+        buf = self.buf
+        end = buf.tell()
+        if end == self._drained:
+            return ""
+        buf.seek(self._drained)
+        out = buf.read(-1 if limit is None else limit)
+        self._drained += len(out)
+        # запись продолжается с конца буфера, а не с места чтения
+        buf.seek(end)
+        return out
+
+    def _closed(self, *args: Any) -> None:
+        raise RuntimeError("DumpBuilder is closed")
+
+    def close(self) -> None:
+        """Вернуть буфер в пул. После close() builder больше не используется."""
+        # привязка к buf.write больше не должна писать в буфер из пула
+        self.add_chunk = self.add_chunks = self.end_file = self._closed
+        buf = getattr(self, "buf", None)
+        if buf is not None:
+            self.buf = None
+            buf.seek(0)
+            buf.truncate(0)
+            _STRINGIO_POOL.append(buf)
@@ -1,61 +1,269 @@
 from __future__ import annotations
+import os
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
+import re, threading
 
 try:
     from pathspec import PathSpec
 except Exception:
     PathSpec = None
 
+# Простые шаблоны, которые решаются без PathSpec: "*.ext", "name", "name/"
+_RE_SIMPLE_EXT = re.compile(r"\*(\.[^*?\[\]\\/!]+)")
+_RE_SIMPLE_NAME = re.compile(r"([^*?\[\]\\/!]+)(/?)")
+
+# (расширения, имена любых компонентов, имена только каталогов)
+SimpleRules = tuple[frozenset[str], frozenset[str], frozenset[str]]
+
+def _simple_rules(lines: list[str]) -> Optional[SimpleRules]:
+    # None, если хоть один шаблон сложнее (маски, пути, отрицания) — тогда нужен PathSpec
+    exts: set[str] = set()
+    names: set[str] = set()
+    dir_names: set[str] = set()
+    for line in lines:
+        m = _RE_SIMPLE_EXT.fullmatch(line)
+        if m:
+            exts.add(m.group(1))
+            continue
+        m = _RE_SIMPLE_NAME.fullmatch(line)
+        if not m or m.group(1) in (".", ".."):
+            return None
+        (dir_names if m.group(2) else names).add(m.group(1))
+    return frozenset(exts), frozenset(names), frozenset(dir_names)
+
+def _simple_include(rules: SimpleRules, sub: str) -> Optional[bool]:
+    # без отрицаний и масок: достаточно сверить компоненты пути с множествами
+    exts, names, dir_names = rules
+    parts = sub.rstrip("/").split("/")
+    last = len(parts) - 1 if not sub.endswith("/") else len(parts)
+    for i, name in enumerate(parts):
+        if name in names or (i < last and name in dir_names):
+            return True
+        # "*.tar.gz" — суффикс с несколькими точками: пробуем хвост от каждой точки
+        dot = name.find(".") if exts else -1
+        while dot != -1:
+            if name[dot:] in exts:
+                return True
+            dot = name.find(".", dot + 1)
+    return None
+
 class GitignoreCache:
     def __init__(self) -> None:
         self.root: Optional[Path] = None
-        self.spec: Optional[PathSpec] = None
-        self._snapshot: dict[Path, float] = {}
+        # .gitignore -> (mtime, строки); неизменённые файлы не перечитываем
+        self._parsed: dict[Path, tuple[float, list[str]]] = {}
+        # каталог относительно корня ("" — сам корень) -> строки его .gitignore;
+        # PathSpec по ним собирается лениво, при первой проверке пути под каталогом
+        self._dir_lines: dict[str, list[str]] = {}
+        self._dir_specs: dict[str, PathSpec] = {}
+        # каталог -> SimpleRules, если все его шаблоны простые, иначе None
+        self._dir_simple: dict[str, Optional[SimpleRules]] = {}
+        # "rel" / "rel/" -> результат ignored(); сбрасывается при каждом build
+        self._results: dict[str, bool] = {}
+        # префиксы корня ("/abs/root/") для быстрого вычисления относительного пути в ignored()
+        self._root_resolved: Optional[Path] = None
+        self._root_prefixes: tuple[str, ...] = ()
 
-    def _collect_gitignores(self, root: Path) -> list[Path]:
-        out = []
-        for p in root.rglob(".gitignore"):
-            out.append(p)
+    def copy(self) -> "GitignoreCache":
+        # независимая копия для фонового запуска: build() копии не трогает словари оригинала;
+        # PathSpec и SimpleRules после сборки только читаются — их делим
+        c = GitignoreCache()
+        c.root, c._root_resolved, c._root_prefixes = self.root, self._root_resolved, self._root_prefixes
+        c._parsed, c._dir_lines = dict(self._parsed), dict(self._dir_lines)
+        c._dir_specs, c._dir_simple = dict(self._dir_specs), dict(self._dir_simple)
+        c._results = dict(self._results)
+        return c
+
+    def _collect_gitignores(self, root: Path, ignore_dirs: frozenset[str], ignore_hidden: bool, cancel: threading.Event | None = None) -> list[Path]:
+        # явный обход через scandir: не спускаемся в ignore_dirs и (при ignore_hidden) в скрытые каталоги;
+        # взведённый cancel обрывает обход на ближайшем каталоге
+        out: list[Path] = []
+        stack = [str(root)]
+        while stack:
+            if cancel is not None and cancel.is_set():
+                break
+            top = stack.pop()
+            try:
+                it = os.scandir(top)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    name = entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if name in ignore_dirs or (ignore_hidden and name.startswith(".")):
+                            continue
+                        stack.append(entry.path)
+                    elif name == ".gitignore" and entry.is_file(follow_symlinks=False):
+                        out.append(Path(entry.path))
         return out
 
-    def _changed(self, files: list[Path]) -> bool:
-        cur = {p: p.stat().st_mtime for p in files}
-        if cur != self._snapshot:
-            self._snapshot = cur
-            return True
-        return False
+    def _parse(self, gi: Path) -> list[str]:
+        # шаблоны остаются относительными к каталогу своего .gitignore, как у git
+        lines: list[str] = []
+        for raw in gi.read_text(encoding="utf-8", errors="ignore").splitlines():
+            s = raw.strip()
+            if not s or s.startswith("#"):
+                continue
+            neg = s.startswith("!")
+            pat = s[1:] if neg else s
+            norm = "/".join(seg for seg in pat.split("/") if seg != ".")
+            lines.append(("!" if neg else "") + norm)
+        return lines
 
-    def build(self, root: Path) -> None:
+    def build(self, root: Path, ignore_dirs: frozenset[str] = frozenset(), ignore_hidden: bool = False, cancel: threading.Event | None = None) -> None:
+        self._results = {}
         if not PathSpec:
-            self.root, self.spec = root, None
+            self.root = root
+            self._dir_lines, self._dir_specs, self._dir_simple = {}, {}, {}
             return
-        gi_files = self._collect_gitignores(root)
-        # всегда обновляем снапшот и узнаём, менялся ли набор .gitignore
-        changed = self._changed(gi_files)
-        if self.root != root or changed:
-            lines: list[str] = []
-            for gi in gi_files:
-                base_rel = gi.parent.relative_to(root).as_posix() if gi.parent != root else ""
-                for raw in gi.read_text(encoding="utf-8", errors="ignore").splitlines():
-                    s = raw.strip()
-                    if not s or s.startswith("#"):
-                        continue
-                    neg = s.startswith("!")
-                    pat = s[1:] if neg else s
-                    if pat.startswith("/"):
-                        pat2 = pat.lstrip("/")
-                    else:
-                        pat2 = (f"{base_rel}/{pat}" if base_rel else pat)
-                    norm = "/".join(seg for seg in pat2.split("/") if seg != ".")
-                    lines.append(("!" if neg else "") + norm)
+        if self.root != root:
+            self._parsed, self._dir_lines, self._dir_specs, self._dir_simple = {}, {}, {}, {}
             self.root = root
-            self.spec = PathSpec.from_lines("gitwildmatch", lines) if lines else None
+            self._root_resolved = root.resolve()
+            self._root_prefixes = tuple(dict.fromkeys((
+                self._root_resolved.as_posix().rstrip("/") + "/",
+                root.as_posix().rstrip("/") + "/",
+            )))
+        parsed: dict[Path, tuple[float, list[str]]] = {}
+        dir_lines: dict[str, list[str]] = {}
+        gitignores = self._collect_gitignores(root, ignore_dirs, ignore_hidden, cancel)
+        if cancel is not None and cancel.is_set():
+            return  # обход оборван: прежние правила остаются, следующий build соберёт заново
+        for gi in gitignores:
+            mtime = gi.stat().st_mtime
+            cached = self._parsed.get(gi)
+            if cached is not None and cached[0] == mtime:
+                gi_lines = cached[1]
+            else:
+                gi_lines = self._parse(gi)
+            parsed[gi] = (mtime, gi_lines)
+            if gi_lines:
+                rel_dir = gi.parent.relative_to(root).as_posix() if gi.parent != root else ""
+                dir_lines[rel_dir] = gi_lines
+        # записи об исчезнувших .gitignore выпадают сами
+        self._parsed = parsed
+        # собранные PathSpec сохраняем только для каталогов с теми же строками
+        self._dir_specs = {
+            d: spec for d, spec in self._dir_specs.items()
+            if dir_lines.get(d) is self._dir_lines.get(d)
+        }
+        self._dir_simple = {
+            d: rules for d, rules in self._dir_simple.items()
+            if dir_lines.get(d) is self._dir_lines.get(d)
+        }
+        self._dir_lines = dir_lines
+
+    def _spec_for(self, rel_dir: str) -> PathSpec:
+        spec = self._dir_specs.get(rel_dir)
+        if spec is None:
+            spec = self._dir_specs[rel_dir] = PathSpec.from_lines("gitwildmatch", self._dir_lines[rel_dir])
+        return spec
 
-    def ignored(self, path: Path) -> bool:
-        if not PathSpec or not self.root or not self.spec:
+    def _check(self, rel_dir: str, sub: str) -> Optional[bool]:
+        # решение одного .gitignore для пути sub (относительно его каталога, у каталогов — с '/'):
+        # True/False — сработал шаблон (игнор / отрицание), None — ни один не сработал
+        try:
+            rules = self._dir_simple[rel_dir]
+        except KeyError:
+            rules = self._dir_simple[rel_dir] = _simple_rules(self._dir_lines[rel_dir])
+        if rules is None:
+            return self._spec_for(rel_dir).check_file(sub).include
+        return _simple_include(rules, sub)
+
+    def _check_many(self, rel_dir: str, subs: list[str]) -> list[Optional[bool]]:
+        # то же, что _check, для пачки путей: PathSpec.check_files проходит их за один вызов
+        try:
+            rules = self._dir_simple[rel_dir]
+        except KeyError:
+            rules = self._dir_simple[rel_dir] = _simple_rules(self._dir_lines[rel_dir])
+        if rules is None:
+            return [r.include for r in self._spec_for(rel_dir).check_files(subs)]
+        return [_simple_include(rules, sub) for sub in subs]
+
+    def _relpath(self, path: Path) -> str:
+        # горячий путь: путь уже лежит под корнем (так его строит walker) — хватает среза строки
+        p = path.as_posix()
+        for prefix in self._root_prefixes:
+            if p.startswith(prefix):
+                return p[len(prefix):]
+        return path.resolve().relative_to(self._root_resolved).as_posix()
+
+    def ignored(self, path: Path, is_dir: bool | None = None) -> bool:
+        if not PathSpec or not self.root or not self._dir_lines:
+            return False
+        rel = self._relpath(path)
+        if is_dir is None:
+            is_dir = path.is_dir()
+        rel = rel.rstrip("/")
+        if not rel:
             return False
-        rel = path.resolve().relative_to(self.root.resolve()).as_posix()
-        if path.is_dir() and not rel.endswith("/"):
-            rel += "/"
-        return bool(self.spec.match_file(rel))
+        return self._ignored_key(rel + "/" if is_dir else rel)
+
+    def _ignored_key(self, key: str) -> bool:
+        # key — путь от корня, у каталогов с '/'; решения запоминаются в _results
+        result = self._results.get(key)
+        if result is not None:
+            return result
+        rel = key.rstrip("/")
+        parent = rel.rpartition("/")[0]
+        # как у git: внутри исключённого каталога шаблоны уже не проверяются и ничего
+        # не возвращается отрицанием; решение по родителю считается один раз на каталог
+        if parent and self._ignored_key(parent + "/"):
+            self._results[key] = True
+            return True
+        result = False
+        # от ближайшего предка к корню: решает самый глубокий .gitignore,
+        # в котором сработал хоть один шаблон (внутри файла — последний сработавший)
+        d = rel
+        while d:
+            d = d.rpartition("/")[0]
+            if d in self._dir_lines:
+                sub = key[len(d) + 1:] if d else key
+                include = self._check(d, sub)
+                if include is not None:
+                    result = include
+                    break
+        self._results[key] = result
+        return result
+
+    def ignored_many(self, paths: Sequence[Path], are_dirs: Sequence[bool]) -> list[bool]:
+        """ignored() для списка путей; пути с общим родителем проверяются одной пачкой на каждый .gitignore."""
+        out = [False] * len(paths)
+        if not PathSpec or not self.root or not self._dir_lines:
+            return out
+        results = self._results
+        groups: dict[str, list[tuple[int, str]]] = {}
+        for i, (path, is_dir) in enumerate(zip(paths, are_dirs)):
+            rel = self._relpath(path).rstrip("/")
+            if not rel:
+                continue
+            key = rel + "/" if is_dir else rel
+            hit = results.get(key)
+            if hit is not None:
+                out[i] = hit
+                continue
+            groups.setdefault(rel.rpartition("/")[0], []).append((i, key))
+        for parent, pending in groups.items():
+            if parent and self._ignored_key(parent + "/"):
+                for i, key in pending:
+                    out[i] = results[key] = True
+                continue
+            d = parent
+            while pending:
+                if d in self._dir_lines:
+                    cut = len(d) + 1 if d else 0
+                    rest: list[tuple[int, str]] = []
+                    for item, include in zip(pending, self._check_many(d, [key[cut:] for _, key in pending])):
+                        if include is None:
+                            rest.append(item)
+                        else:
+                            out[item[0]] = results[item[1]] = include
+                    pending = rest
+                if not d:
+                    break
+                d = d.rpartition("/")[0]
+            for _, key in pending:
+                results[key] = False
+        return out
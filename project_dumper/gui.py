@@ -1,24 +1,31 @@
 from __future__ import annotations
+from array import array
+import bisect
+from collections import deque
+from dataclasses import astuple
+from functools import lru_cache
 from pathlib import Path
-import queue
+from typing import Sequence
+import os, re, stat, threading
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 
 from .walker import Walker, ScanThread
 from .formatter import DumpBuilder
+from .file_cache import FileCache
 from .config import load_defaults, save_defaults, Config
 from .diff_logic import (
     DiffLineType,
+    DiffModel,
     classify_line,
-    detect_diff_block_indices,
-    find_hunk_header_prefix,
-    get_group_indices,
-    strip_for_copy,
+    detect_diff_block_bitmap,
+    diff_header_rows,
+    highlight_span,
 )
 
-def _apply_dark_palette(app: QtWidgets.QApplication) -> None:
-    app.setStyle("Fusion")
-
+@lru_cache(maxsize=1)
+def _dark_palette() -> QtGui.QPalette:
+    # собирается один раз и переиспользуется при каждом переключении темы
     p = QtGui.QPalette()
     base = QtGui.QColor(45, 45, 45)
     alt = QtGui.QColor(53, 53, 53)
@@ -39,43 +46,241 @@ def _apply_dark_palette(app: QtWidgets.QApplication) -> None:
     p.setColor(QtGui.QPalette.ColorGroup.Disabled, QtGui.QPalette.ColorRole.Text, disabled)
     p.setColor(QtGui.QPalette.ColorGroup.Disabled, QtGui.QPalette.ColorRole.WindowText, disabled)
     p.setColor(QtGui.QPalette.ColorGroup.Disabled, QtGui.QPalette.ColorRole.ButtonText, disabled)
-    app.setPalette(p)
+    return p
+
+def _apply_dark_palette(app: QtWidgets.QApplication) -> None:
+    app.setStyle("Fusion")
+    app.setPalette(_dark_palette())
+
+# модификаторы копирования группы в Diff: значение diff_group_modifier -> маска,
+# которой должны в точности совпасть нажатые Ctrl/Shift/Alt
+_KM = QtCore.Qt.KeyboardModifier
+_GROUP_MODIFIERS = {
+    "Ctrl": _KM.ControlModifier,
+    "Shift": _KM.ShiftModifier,
+    "Alt": _KM.AltModifier,
+    "Ctrl+Shift": _KM.ControlModifier | _KM.ShiftModifier,
+}
+_GROUP_MODIFIER_MASK = _KM.ControlModifier | _KM.ShiftModifier | _KM.AltModifier
+
+# Сколько блоков перекрашивается за один шаг schedule_rehighlight
+_REHIGHLIGHT_BATCH = 200
+
 
 class DiffHighlighter(QtGui.QSyntaxHighlighter):
     """
     Подсветка диффа во вкладке Diff.
 
     Опирается на:
-      - полный текст документа (разбитый на строки),
-      - detect_diff_block_indices / classify_line / find_hunk_header_prefix.
-    Цвета подбираются в зависимости от текущей темы из конфигурации.
+      - после сканирования — готовые типы строк из DiffModel окна,
+      - до него — собственную копию строк документа, которая правится
+        по contentsChange только вокруг изменённых блоков, и
+        diff_header_rows / classify_line,
+      - highlight_span для участка строки, который красится (например, '@@ ... @@').
+    Цвета — по теме, которую окно передаёт через set_theme. Документ больше
+    diff_highlight_max_chars не подсвечивается (update_size_gate).
     """
 
-    def __init__(self, parent_doc: QtGui.QTextDocument, main_window: "MainWindow") -> None:
-        super().__init__(parent_doc)
+    # True — подсветка отключена из-за размера документа, False — снова работает
+    suspended_changed = QtCore.pyqtSignal(bool)
+
+    def __init__(self, parent_doc: QtGui.QTextDocument, main_window: "MainWindow", theme: str = "light") -> None:
+        # документ подключаем после своего слота contentsChange: Qt вызывает слоты
+        # в порядке подключения, и к перекраске блоков копия строк уже обновлена
+        super().__init__(None)
         self._mw = main_window
+        self._doc = parent_doc
+        # подсветка включена вручную несмотря на размер; сбрасывается, когда документ помещается
+        self._forced = False
         self._lines: list[str] = []
-        self._diff_indices: set[int] = set()
+        self._header_rows: bytearray = bytearray()  # 1 — строка начинает заголовок diff
+        self._diff_indices: bytearray = bytearray()
         self._revision: int = -1
+        # форматы создаются один раз; цвета в них меняются только при смене темы
+        self._fmt_plus = QtGui.QTextCharFormat()
+        self._fmt_minus = QtGui.QTextCharFormat()
+        self._fmt_diff = QtGui.QTextCharFormat()
+        self._fmt_hunk = QtGui.QTextCharFormat()
+        self._theme_name: str | None = None
+        # у '@@'-строк типа OTHER (открытый хедер) подсвечиваются только '@@' — серым
+        self._formats = {
+            DiffLineType.HEADER_DIFF: self._fmt_diff,
+            DiffLineType.HEADER_HUNK: self._fmt_hunk,
+            DiffLineType.HEADER_HUNK_EMPTY: self._fmt_hunk,
+            DiffLineType.OTHER: self._fmt_hunk,
+            DiffLineType.PLUS: self._fmt_plus,
+            DiffLineType.MINUS: self._fmt_minus,
+        }
+        self.set_theme(theme)
+        parent_doc.contentsChange.connect(self._on_contents_change)
+        self.setParent(parent_doc)
+        self.setDocument(parent_doc)
+        # постепенная перекраска (schedule_rehighlight): следующий блок и сколько осталось
+        self._rh_next = 0
+        self._rh_left = 0
+        self._rh_timer = QtCore.QTimer(self)
+        self._rh_timer.setSingleShot(True)
+        self._rh_timer.setInterval(0)
+        self._rh_timer.timeout.connect(self._rehighlight_step)
+        # блоки большой вставки, подсветка которых отложена до паузы в правках
+        self._defer_range: tuple[int, int] | None = None
+        self._defer_timer = QtCore.QTimer(self)
+        self._defer_timer.setSingleShot(True)
+        self._defer_timer.setInterval(150)
+        self._defer_timer.timeout.connect(self._on_defer_timeout)
+
+    def _on_defer_timeout(self) -> None:
+        if self._defer_range is None:
+            return
+        start = self._defer_range[0]
+        self._defer_range = None
+        self.schedule_rehighlight(start)
+
+    def schedule_rehighlight(self, start_block: int = 0) -> None:
+        """
+        Перекрасить весь документ пачками по _REHIGHLIGHT_BATCH блоков,
+        отдавая управление циклу событий между пачками: на большом диффе
+        окно не замирает. Начинает со start_block (обычно первая видимая
+        строка) и идёт до конца, потом с начала. Короткий документ
+        перекрашивается сразу.
+        """
+        doc = self.document()
+        if doc is None:
+            return  # подсветка отключена по размеру — перекрасится при подключении
+        count = doc.blockCount()
+        if count <= _REHIGHLIGHT_BATCH:
+            self._rh_timer.stop()
+            self._rh_left = 0
+            self.rehighlight()
+            return
+        self._rh_next = min(max(0, start_block), count - 1)
+        self._rh_left = count
+        self._rehighlight_step()
+
+    def _rehighlight_step(self) -> None:
+        doc = self.document()
+        self._rh_left = min(self._rh_left, doc.blockCount())
+        block = doc.findBlockByNumber(self._rh_next)
+        for _ in range(min(_REHIGHLIGHT_BATCH, self._rh_left)):
+            if not block.isValid():
+                block = doc.begin()
+            self.rehighlightBlock(block)
+            block = block.next()
+            self._rh_left -= 1
+        self._rh_next = block.blockNumber() if block.isValid() else 0
+        if self._rh_left > 0:
+            self._rh_timer.start()
+
+    def update_size_gate(self) -> None:
+        """
+        Отключить подсветку, если документ длиннее diff_highlight_max_chars
+        (QSyntaxHighlighter на таком тексте подвешивает окно), и вернуть её,
+        когда он снова помещается или её включили явно (highlight_anyway).
+        """
+        limit = self._mw.w.cfg.diff_highlight_max_chars
+        fits = not limit or self._doc.characterCount() <= limit
+        if fits:
+            self._forced = False
+        on = fits or self._forced
+        if on == (self.document() is not None):
+            return
+        if on:
+            self._attach()
+        else:
+            self._detach()
+        self.suspended_changed.emit(not on)
+
+    def highlight_anyway(self) -> None:
+        self._forced = True
+        self.update_size_gate()
+
+    def _detach(self) -> None:
+        self._rh_timer.stop()
+        self._rh_left = 0
+        self._defer_timer.stop()
+        self._defer_range = None
+        self._revision = -1
+        self.setDocument(None)  # Qt заодно снимает уже наложенные форматы
+
+    def _attach(self) -> None:
+        # подключённый документ Qt перекрашивает целиком за один заход на следующем тике:
+        # эти вызовы проходят через отложенный диапазон, а сама перекраска идёт пачками
+        count = self._doc.blockCount()
+        if count > _REHIGHLIGHT_BATCH:
+            self._defer_range = (0, count - 1)
+            self._defer_timer.start()
+        self.setDocument(self._doc)
 
     def _ensure_context(self) -> None:
+        # полная пересборка — только если копия не успевала за документом
         doc = self.document()
         rev = doc.revision()
         if rev == self._revision:
             return
-        full_text = doc.toPlainText()
-        self._lines = full_text.splitlines()
-        self._diff_indices = detect_diff_block_indices(self._lines)
+        # строки — ровно по блокам документа (разделитель '\n'), номер строки = номер блока
+        self._lines = doc.toPlainText().split("\n")
+        self._header_rows = diff_header_rows(self._lines)
+        self._diff_indices = detect_diff_block_bitmap(self._lines)
         self._revision = rev
 
-    def _current_theme_colors(self) -> tuple[QtGui.QColor, QtGui.QColor, QtGui.QColor, QtGui.QColor]:
+    def _on_contents_change(self, position: int, removed: int, added: int) -> None:
+        # слот подключён раньше слота Qt: отключённая здесь подсветка эту правку уже не красит
+        self.update_size_gate()
+        doc = self.document()
+        if doc is None:
+            return
+        if self._mw._diff_locked:
+            self._revision = -1  # подсветка идёт по DiffModel; копию соберём при разблокировке
+            return
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(min(position + added, doc.characterCount() - 1)).blockNumber()
+        whole = first == 0 and last == doc.blockCount() - 1
+        if last - first >= _REHIGHLIGHT_BATCH and not whole:
+            # большая вставка: Qt сразу после этого слота позовёт highlightBlock на каждый
+            # её блок — эти блоки пропускаются и перекрашиваются пачками после паузы
+            # (замену всего текста программой, setPlainText, красим как раньше — сразу)
+            if self._defer_range is not None:
+                first_d, last_d = self._defer_range
+                self._defer_range = (min(first, first_d), max(last, last_d))
+            else:
+                self._defer_range = (first, last)
+            self._defer_timer.start()
+        elif self._defer_timer.isActive():
+            self._defer_timer.start()  # правки продолжаются — отложенная перекраска ждёт паузы
+        if self._revision == -1:
+            return  # копии ещё нет — соберётся целиком при первой подсветке
+        count = doc.blockCount()
+        old_last = last - (count - len(self._lines))
+        if first < 0 or last < first or old_last < first - 1 or old_last >= len(self._lines):
+            self._revision = -1
+            return
+        if whole:
+            self._revision = -1  # заменён весь текст (setPlainText) — дешевле собрать заново
+            self._ensure_context()
+            return
+        block = doc.findBlockByNumber(first)
+        new_lines: list[str] = []
+        for _ in range(last - first + 1):
+            new_lines.append(block.text())
+            block = block.next()
+        self._lines[first:old_last + 1] = new_lines
+        self._header_rows[first:old_last + 1] = diff_header_rows(new_lines)
+        # блок заголовка строки i зависит от строк i-3..i: пересчитываем окно вокруг правки
+        bm = self._diff_indices
+        bm[first:old_last + 1] = bytes(len(new_lines))
+        rows = self._header_rows
+        for i in range(first, min(last + 4, count)):
+            bm[i] = 1 if rows.rfind(1, max(0, i - 3), i + 1) != -1 else 0
+        self._revision = doc.revision()
+
+    def set_theme(self, theme: str) -> None:
         """
-        Вернуть (color_plus, color_minus, color_diff_header, color_hunk_header) для текущей темы.
+        Перекрасить общие форматы под тему ("light"/"dark"). Окно зовёт при
+        смене темы; перекраску документа запускает само (schedule_rehighlight).
         """
-        theme = getattr(getattr(self._mw, "w", None), "cfg", None)
-        theme_name = getattr(theme, "theme", "light") if theme is not None else "light"
-
-        if theme_name == "dark":
+        if theme == self._theme_name:
+            return
+        if theme == "dark":
             plus = QtGui.QColor(144, 238, 144)
             minus = QtGui.QColor(255, 160, 160)
             # основной текст ~220,220,220 → делаем хедеры заметно темнее
@@ -88,92 +293,126 @@ class DiffHighlighter(QtGui.QSyntaxHighlighter):
             # основной текст чёрный → делаем хедеры средне-серыми
             diff = QtGui.QColor(140, 140, 140)
             hunk = QtGui.QColor(140, 140, 140)
-        return plus, minus, diff, hunk
+        self._fmt_plus.setForeground(plus)
+        self._fmt_minus.setForeground(minus)
+        self._fmt_diff.setForeground(diff)
+        self._fmt_hunk.setForeground(hunk)
+        self._theme_name = theme
 
     def highlightBlock(self, text: str) -> None:  # type: ignore[override]
         """
-        Основная логика подсветки по строкам.
-
-        Приоритет:
-          1) HEADER_DIFF — вся строка серая.
-          2) HEADER_HUNK — сегмент '@@ ... @@' серый целиком.
-          3) PLUS/MINUS — вся строка зелёная/красная.
-          4) Линии, начинающиеся с '@@' БЕЗ закрывающих '@@' — только первые два '@@' серые.
-          5) OTHER — базовое оформление (ничего не делаем).
+        Подсветка одной строки: участок из highlight_span цветом её типа.
+
+          HEADER_DIFF — вся строка серая;
+          HEADER_HUNK — сегмент '@@ ... @@' серый целиком;
+          PLUS/MINUS — вся строка зелёная/красная;
+          '@@' БЕЗ закрывающих '@@' (OTHER) — серые только первые два '@@';
+          остальные OTHER — базовое оформление.
         """
-        self._ensure_context()
         block = self.currentBlock()
         idx = block.blockNumber()
-
-        if idx < 0 or idx >= len(self._lines):
+        if idx < 0:
+            return
+        deferred = self._defer_range
+        if deferred is not None and deferred[0] <= idx <= deferred[1]:
+            return  # часть большой вставки: перекрасится после паузы
+
+        # текст зафиксирован — типы и участки уже посчитаны при сканировании
+        model = self._mw._diff_model if self._mw._diff_locked else None
+        if model is not None and idx < len(model.spans):
+            line_type = model.types[idx]
+            span = model.spans[idx]
+        else:
+            self._ensure_context()
+            if idx >= len(self._lines):
+                return
+            line_type = classify_line(self._lines, idx, self._diff_indices)
+            span = highlight_span(text, line_type)
+            # состояние блока — расстояние до заголовка diff (0..3) или -1: если оно
+            # поменялось, Qt сам перекрасит следующие строки, чей блок сдвинулся
+            k = self._header_rows.rfind(1, max(0, idx - 3), idx + 1)
+            self.setCurrentBlockState(idx - k if k != -1 else -1)
+        if span is None:
             return
+        self.setFormat(span[0], span[1], self._formats[line_type])
 
-        line_type = classify_line(self._lines, idx, self._diff_indices)
-        plus_color, minus_color, diff_color, hunk_color = self._current_theme_colors()
 
-        if line_type is DiffLineType.HEADER_DIFF:
-            fmt = QtGui.QTextCharFormat()
-            fmt.setForeground(diff_color)
-            self.setFormat(0, len(text), fmt)
-            return
+class DiffTextEdit(QtWidgets.QPlainTextEdit):
+    """
+    Поле диффа, которое само рисует подсветку скопированных строк: жёлтые
+    полосы поверх текста в paintEvent, без ExtraSelection и слияния форматов.
+    Полосы задаёт set_flash; перерисовываются только их участки экрана.
+    """
 
-        if line_type is DiffLineType.HEADER_HUNK_EMPTY:
-            fmt = QtGui.QTextCharFormat()
-            fmt.setForeground(hunk_color)
-            self.setFormat(0, len(text), fmt)
-            return
+    def __init__(self, parent: QtWidgets.QWidget | None = None) -> None:
+        super().__init__(parent)
+        # (отсортированные номера строк, прозрачность 0..255) — по группе на элемент
+        self._flash: list[tuple[Sequence[int], int]] = []
 
-        if line_type is DiffLineType.HEADER_HUNK:
-            # классический хедер вида '@@ -1,3 +1,4 @@' —
-            # делаем серым весь сегмент '@@ ... @@'
-            sl = find_hunk_header_prefix(text)
-            if sl is not None:
-                fmt = QtGui.QTextCharFormat()
-                fmt.setForeground(hunk_color)
-                start = max(0, sl.start)
-                length = max(0, sl.stop - sl.start)
-                self.setFormat(start, length, fmt)
+    def set_flash(self, bands: list[tuple[Sequence[int], int]]) -> None:
+        old = self._flash
+        if len(old) == len(bands) and all(a is b and x == y for (a, x), (b, y) in zip(old, bands)):
             return
-
-        if line_type is DiffLineType.PLUS:
-            fmt = QtGui.QTextCharFormat()
-            fmt.setForeground(plus_color)
-            self.setFormat(0, len(text), fmt)
+        self._flash = bands
+        # одна перерисовка на объединение полос: прежних (гасим) и новых
+        region = QtGui.QRegion()
+        for lines, _ in old + bands:
+            rect = self._visible_band(lines)
+            if rect is not None:
+                region += rect
+        if not region.isEmpty():
+            self.viewport().update(region)
+
+    def _visible_range(self) -> tuple[int, int]:
+        first = self.firstVisibleBlock().blockNumber()
+        last = self.cursorForPosition(self.viewport().rect().bottomLeft()).blockNumber()
+        return first, last
+
+    def _visible_band(self, lines: Sequence[int]) -> QtCore.QRect | None:
+        # полоса экрана от первой до последней видимой строки группы
+        first, last = self._visible_range()
+        lo = bisect.bisect_left(lines, first)
+        hi = bisect.bisect_right(lines, last)
+        if lo == hi:
+            return None
+        doc, offset = self.document(), self.contentOffset()
+        top = self.blockBoundingGeometry(doc.findBlockByNumber(lines[lo])).translated(offset).top()
+        bottom = self.blockBoundingGeometry(doc.findBlockByNumber(lines[hi - 1])).translated(offset).bottom()
+        return QtCore.QRect(0, int(top), self.viewport().width(), int(bottom - top) + 2)
+
+    def paintEvent(self, event: QtGui.QPaintEvent) -> None:  # type: ignore[override]
+        super().paintEvent(event)
+        if not self._flash:
             return
-
-        if line_type is DiffLineType.MINUS:
-            fmt = QtGui.QTextCharFormat()
-            fmt.setForeground(minus_color)
-            self.setFormat(0, len(text), fmt)
+        first, last = self._visible_range()
+        alpha_by_line: dict[int, int] = {}
+        for lines, alpha in self._flash:
+            lo = bisect.bisect_left(lines, first)
+            hi = bisect.bisect_right(lines, last)
+            for i in lines[lo:hi]:
+                alpha_by_line[i] = alpha
+        if not alpha_by_line:
             return
-
-        # Дополнительный случай: строка начинается с '@@', но НЕТ закрывающих '@@'.
-        # Пример из git diff:
-        #   @@ def test_strip_for_copy_header_not_at_start_due_to_plus() -> None:
-        # Тогда серыми должны быть только первые два '@@', остальной текст — обычный.
-        stripped = text.lstrip()
-        if (
-            stripped.startswith("@@")
-            and text  # непустая
-            and text[0] not in {"+", "-"}  # не строки с изменениями
-        ):
-            # Проверяем, что после первых '@@' больше нет пары '@@' — это "открытый" хедер.
-            rest = stripped[2:]
-            if "@@" not in rest:
-                offset = len(text) - len(stripped)  # позиция первых '@@' в исходной строке
-                fmt = QtGui.QTextCharFormat()
-                fmt.setForeground(hunk_color)
-                self.setFormat(offset, 2, fmt)
-
-        # OTHER — без дополнительной подсветки
-
-
-def _apply_light_palette(app: QtWidgets.QApplication) -> None:
+        painter = QtGui.QPainter(self.viewport())
+        try:
+            offset = self.contentOffset()
+            width = self.viewport().width()
+            for i, alpha in alpha_by_line.items():
+                block = self.document().findBlockByNumber(i)
+                if not block.isValid():
+                    continue
+                r = self.blockBoundingGeometry(block).translated(offset)
+                painter.fillRect(QtCore.QRectF(0, r.top(), width, r.height()), QtGui.QColor(255, 255, 0, alpha))
+        finally:
+            painter.end()
+
+
+@lru_cache(maxsize=1)
+def _light_palette() -> QtGui.QPalette:
     """
-    Явная светлая палитра, независимая от системной темы.
-    Используем стиль Fusion и ручной набор цветов с белым фоном и чёрным текстом.
+    Явная светлая палитра, независимая от системной темы:
+    ручной набор цветов с белым фоном и чёрным текстом. Собирается один раз.
     """
-    app.setStyle("Fusion")
     p = QtGui.QPalette()
 
     window = QtGui.QColor(250, 250, 250)
@@ -197,7 +436,148 @@ def _apply_light_palette(app: QtWidgets.QApplication) -> None:
     p.setColor(QtGui.QPalette.ColorGroup.Disabled, QtGui.QPalette.ColorRole.Text, disabled)
     p.setColor(QtGui.QPalette.ColorGroup.Disabled, QtGui.QPalette.ColorRole.WindowText, disabled)
     p.setColor(QtGui.QPalette.ColorGroup.Disabled, QtGui.QPalette.ColorRole.ButtonText, disabled)
-    app.setPalette(p)
+    return p
+
+def _apply_light_palette(app: QtWidgets.QApplication) -> None:
+    app.setStyle("Fusion")
+    app.setPalette(_light_palette())
+
+def _validate_root(path_str: str) -> Path | None:
+    # один stat() вместо пары exists() + is_dir(); None — пути нет или это не каталог
+    try:
+        st = os.stat(path_str)
+    except (OSError, ValueError):
+        return None
+    return Path(path_str) if stat.S_ISDIR(st.st_mode) else None
+
+# Сколько символов дампа вставляется в поле за один тик: большая вставка
+# не подвешивает окно на раскладке документа, остаток уходит следующими тиками
+_FLUSH_CHARS = 256 * 1024
+_FLUSH_MS = 100
+
+# Роль данных элемента дерева: True у каталогов (тип известен из scandir при построении)
+_IS_DIR_ROLE = QtCore.Qt.ItemDataRole.UserRole + 1
+
+# Оформление исключённых файлов в дереве: общие объекты на все элементы
+_EXCLUDED_BRUSH = QtGui.QBrush(QtGui.QColor(160,160,160))
+_NORMAL_BRUSH = QtGui.QBrush()
+
+@lru_cache(maxsize=1)
+def _item_fonts() -> tuple[QtGui.QFont, QtGui.QFont]:
+    # (зачёркнутый, обычный); QFont создаём лениво — нужен уже созданный QApplication
+    strike = QtGui.QFont()
+    strike.setStrikeOut(True)
+    return strike, QtGui.QFont()
+
+# разделитель списков в настройках: запятая вместе с пробелами/переводами строк вокруг
+_CSV_RE = re.compile(r"\s*,\s*")
+
+def _split_csv(s: str) -> tuple[str, ...]:
+    return tuple(filter(None, _CSV_RE.split(s.strip())))
+
+
+def _tree_settings(cfg: Config) -> tuple:
+    # настройки, от которых зависит содержимое дерева
+    return (cfg.ignore_hidden, cfg.follow_symlinks, cfg.dirs_first_in_tree,
+            tuple(cfg.ignore_dirs), tuple(cfg.ignore_files))
+
+
+class _ScanSignals(QtCore.QObject):
+    """
+    Мост ScanThread -> GUI: put() вызывается из потока сканирования вместо
+    queue.Queue.put. Сообщения копятся в списке, а queued-сигнал ready
+    отправляется только когда список был пуст: GUI за один вызов забирает
+    через take() всё накопившееся, а не обрабатывает событие на каждый кусок.
+
+    scan_id отличает сообщения текущего запуска от ещё не закончившихся старых.
+    """
+
+    ready = QtCore.pyqtSignal(int)
+
+    def __init__(self, scan_id: int) -> None:
+        super().__init__()
+        self.scan_id = scan_id
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, object]] = []
+
+    def put(self, item: tuple[str, object]) -> None:
+        with self._lock:
+            self._pending.append(item)
+            wake = len(self._pending) == 1
+        if wake:
+            self.ready.emit(self.scan_id)
+
+    def put_many(self, items: list[tuple[str, object]]) -> None:
+        # пачка от ScanThread: одна блокировка и не больше одного сигнала на всю пачку
+        with self._lock:
+            wake = not self._pending
+            self._pending.extend(items)
+        if wake:
+            self.ready.emit(self.scan_id)
+
+    def take(self) -> list[tuple[str, object]]:
+        with self._lock:
+            items, self._pending = self._pending, []
+        return items
+
+
+class _SaveSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str, str)
+
+
+# символ вне BMP: в документе Qt занимает две позиции (суррогатная пара)
+_RE_ASTRAL = re.compile("[\U00010000-\U0010ffff]")
+
+# сколько символов дампа кодируется и пишется за раз при сохранении
+_SAVE_CHUNK = 1 << 20
+
+
+def _document_pieces(doc: QtGui.QTextDocument) -> list[str]:
+    # текст документа по блокам, склеенный в куски ~_SAVE_CHUNK символов:
+    # без одной строки на весь документ, как у toPlainText()
+    pieces: list[str] = []
+    buf: list[str] = []
+    size = 0
+    block = doc.begin()
+    while block.isValid():
+        nxt = block.next()
+        t = block.text()
+        buf.append(t + "\n" if nxt.isValid() else t)
+        size += len(t) + 1
+        if size >= _SAVE_CHUNK:
+            pieces.append("".join(buf))
+            buf, size = [], 0
+        block = nxt
+    if buf:
+        pieces.append("".join(buf))
+    return pieces
+
+
+class _SaveJob(QtCore.QRunnable):
+    """Запись дампа в файл в пуле потоков: большой дамп не подвешивает окно."""
+
+    def __init__(self, path: str, data: str | list[str]) -> None:
+        super().__init__()
+        self.path = path
+        self.data = data  # строка целиком или уже нарезанные куски (_document_pieces)
+        self.signals = _SaveSignals()
+
+    def run(self) -> None:
+        try:
+            # кусками: в байты кодируется по мегабайту, а не весь дамп разом
+            data = self.data
+            with open(self.path, "w", encoding="utf-8", buffering=_SAVE_CHUNK) as f:
+                if isinstance(data, list):
+                    f.writelines(data)
+                else:
+                    for i in range(0, len(data), _SAVE_CHUNK):
+                        f.write(data[i:i + _SAVE_CHUNK])
+        except Exception as e:
+            self.signals.failed.emit(self.path, str(e))
+        else:
+            self.signals.finished.emit(self.path)
+
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
@@ -209,10 +589,46 @@ class MainWindow(QtWidgets.QMainWindow):
         self.w.cfg = load_defaults()
 
         self.root_path: Path | None = None
-        self.collapsed_dirs: set[Path] = set()
-        self.excluded_files: set[Path] = set()
-
-        self.q: "queue.Queue[tuple[str, object]]" = queue.Queue()
+        # пути хранятся строками (str(Path), как в UserRole элементов дерева):
+        # хеш и сравнение строк дешевле, чем у Path
+        self.collapsed_dirs: set[str] = set()
+        self.excluded_files: set[str] = set()
+        # каталог -> индекс его строки в tree_model; заполняется в _rebuild_tree
+        self._path_to_index: dict[str, QtCore.QPersistentModelIndex] = {}
+        # свёрнутые каталоги, чьё содержимое ещё не загружено (вместо детей — заглушка)
+        self._lazy_dirs: dict[str, QtCore.QPersistentModelIndex] = {}
+
+        # сообщения ScanThread приходят сигналом; id отсекает запоздавшие от прошлых запусков
+        self._scan_id: int = 0
+        self._scan_signals: _ScanSignals | None = None
+        self._scan_thread: ScanThread | None = None
+        self._scan_cancel: threading.Event | None = None  # отмена текущего ScanThread
+        # подпись дерева на момент последнего _rebuild_tree (см. _tree_signature)
+        self._tree_sig: tuple | None = None
+        self._file_cache: FileCache | None = None
+        self._save_signals: set[_SaveSignals] = set()  # незавершённые фоновые сохранения
+        # (revision, текст дампа, символы вне BMP: индексы в str и позиции в документе)
+        self._find_cache: tuple[int, str, list[int], list[int]] | None = None
+        self._find_matches: tuple[int, str, list[int]] | None = None  # (revision, запрос, начала совпадений)
+        # последний готовый дамп и ключ его входных данных (_dump_key)
+        self._last_dump: str | None = None
+        self._last_dump_key: tuple | None = None
+        # True, когда в поле дампа целиком показан _last_dump (сборка завершена)
+        self._dump_complete = False
+        self._job_key: tuple | None = None
+        # серия кликов по дереву сливается в одну пересборку дампа через 150 мс после последнего
+        self._dump_debounce = QtCore.QTimer(self)
+        self._dump_debounce.setSingleShot(True)
+        self._dump_debounce.setInterval(150)
+        self._dump_debounce.timeout.connect(self._start_pending_dump)
+        # накопленный текст дампа (txt/md) выводится пачкой не чаще раза в 100 мс
+        self._dump_flush_timer = QtCore.QTimer(self)
+        self._dump_flush_timer.setSingleShot(True)
+        self._dump_flush_timer.setInterval(_FLUSH_MS)
+        self._dump_flush_timer.timeout.connect(self._flush_dump_text)
+        # хвост готового дампа, ещё не вставленный в поле (после "done"), и позиция в нём
+        self._dump_tail = ""
+        self._dump_tail_pos = 0
         self.builder: DumpBuilder | None = None
         self._total_files: int = 0
         self._file_index: int = 0
@@ -220,27 +636,36 @@ class MainWindow(QtWidgets.QMainWindow):
         # Настройки Diff UI (будут созданы в _build_ui)
         self.diff_group_modifier_combo: QtWidgets.QComboBox | None = None
         self.diff_flash_ms_spin: QtWidgets.QSpinBox | None = None
+        self.diff_highlight_max_spin: QtWidgets.QSpinBox | None = None
 
         # Состояние вкладки Diff
-        self.diff_text: QtWidgets.QPlainTextEdit | None = None
+        self.diff_text: DiffTextEdit | None = None
         self.diff_scan_btn: QtWidgets.QPushButton | None = None
         self.diff_new_btn: QtWidgets.QPushButton | None = None
+        self.diff_highlight_btn: QtWidgets.QPushButton | None = None
         self._diff_locked: bool = False
         self._diff_lines: list[str] = []
-        self._diff_block_indices: set[int] = set()  # пока не используем, но оставим на будущее
+        # типы строк, тексты для копирования и first_chars — считаются один раз в diff_scan
+        self._diff_model: DiffModel = DiffModel()
         self.diff_highlighter: DiffHighlighter | None = None
+        # тема, чья палитра сейчас выставлена; None — неизвестно (первое применение обязательно)
+        self._current_theme: str | None = None
 
         # Анимация подсветки копируемых строк во вкладке Diff
-        self._diff_flash_slots: dict[int, int] = {}  # line_idx -> age_ms
-        self._diff_flash_timer = QtCore.QTimer(self)
+        # группы одновременно скопированных строк: [старт_мс по _diff_flash_clock, отсортированные индексы строк];
+        # стареет группа целиком, строка состоит не больше чем в одной группе
+        self._diff_flash_groups: list[list] = []
+        # одна анимация на все группы: кадры даёт таймер анимаций Qt, а длится она
+        # до угасания самой свежей группы; возраст групп — по общим часам
+        self._diff_flash_clock = QtCore.QElapsedTimer()
+        self._diff_flash_clock.start()
+        self._diff_flash_anim = QtCore.QVariantAnimation(self)
+        self._diff_flash_anim.setStartValue(0.0)
+        self._diff_flash_anim.setEndValue(1.0)
 
         self._build_ui()
         self._connect_signals()
 
-        self.timer = QtCore.QTimer(self)
-        self.timer.setInterval(50)
-        self.timer.timeout.connect(self._pump_queue)
-
     # UI
     def _build_ui(self) -> None:
         tabs = QtWidgets.QTabWidget(self)
@@ -282,6 +707,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.find_btn = QtWidgets.QPushButton("Найти"); search_bar.addWidget(self.find_btn)
 
         self.text = QtWidgets.QPlainTextEdit(); self.text.setReadOnly(True)
+        # дамп дописывается кусками или ставится целиком; история undo для read-only поля
+        # не нужна — без неё setPlainText не копирует прежний текст в стек отмены
+        self.text.setUndoRedoEnabled(False)
         font = QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont); font.setPointSize(10)
         self.text.setFont(font); r_v.addWidget(self.text, 1)
 
@@ -305,9 +733,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.diff_new_btn = QtWidgets.QPushButton("Новый дифф")
         d_top.addWidget(self.diff_scan_btn)
         d_top.addWidget(self.diff_new_btn)
+        # видна, пока подсветка отключена из-за размера диффа
+        self.diff_highlight_btn = QtWidgets.QPushButton("Подсветить всё равно")
+        self.diff_highlight_btn.setVisible(False)
+        d_top.addWidget(self.diff_highlight_btn)
         d_top.addStretch(1)
 
-        self.diff_text = QtWidgets.QPlainTextEdit()
+        self.diff_text = DiffTextEdit()
         self.diff_text.setReadOnly(False)
         d_v.addWidget(self.diff_text, 1)
         # моноширинный шрифт, как в основной панели текста
@@ -315,7 +747,7 @@ class MainWindow(QtWidgets.QMainWindow):
         diff_font.setPointSize(10)
         self.diff_text.setFont(diff_font)
         # подсветка диффа
-        self.diff_highlighter = DiffHighlighter(self.diff_text.document(), self)
+        self.diff_highlighter = DiffHighlighter(self.diff_text.document(), self, self.w.cfg.theme)
 
         # Настройки
         page_settings = QtWidgets.QWidget(); tabs.addTab(page_settings, "Настройки")
@@ -346,6 +778,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.chk_include_collapsed = QtWidgets.QCheckBox()
         self.chk_include_collapsed.setChecked(self.w.cfg.include_collapsed_in_dump)
         s_v.addRow("Показывать свёрнутые в дампе", self.chk_include_collapsed)
+        self.chk_dump_cache = QtWidgets.QCheckBox(); self.chk_dump_cache.setChecked(self.w.cfg.dump_cache)
+        self.chk_dump_cache.setToolTip("Текст файлов сохраняется в каталоге кешей пользователя")
+        s_v.addRow("Кешировать прочитанные файлы", self.chk_dump_cache)
 
         # Тема: кнопка “солнышко-луна”
         self.theme_btn = QtWidgets.QToolButton()
@@ -359,7 +794,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # Настройки Diff
         # Модификатор для копирования группы строк
         self.diff_group_modifier_combo = QtWidgets.QComboBox()
-        modifiers = ["Ctrl", "Shift", "Alt", "Ctrl+Shift"]
+        modifiers = list(_GROUP_MODIFIERS)
         self.diff_group_modifier_combo.addItems(modifiers)
         cur_modifier = getattr(self.w.cfg, "diff_group_modifier", "Ctrl")
         if cur_modifier not in modifiers:
@@ -375,6 +810,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.diff_flash_ms_spin.setValue(int(flash_ms))
         s_v.addRow("Подсветка копирования (мс)", self.diff_flash_ms_spin)
 
+        # Размер диффа, после которого подсветка отключается
+        self.diff_highlight_max_spin = QtWidgets.QSpinBox()
+        self.diff_highlight_max_spin.setRange(0, 2**31 - 1)
+        self.diff_highlight_max_spin.setSingleStep(64 * 1024)
+        self.diff_highlight_max_spin.setValue(int(self.w.cfg.diff_highlight_max_chars))
+        s_v.addRow("Подсветка диффа до (символов, 0 — всегда)", self.diff_highlight_max_spin)
+
         # Кнопки применения/сохранения — САМИЙ НИЗ
         s_btns = QtWidgets.QHBoxLayout()
         self.btn_apply = QtWidgets.QPushButton("Применить")
@@ -389,19 +831,22 @@ class MainWindow(QtWidgets.QMainWindow):
         self.find_btn.clicked.connect(self.find_next)
         self.copy_btn.clicked.connect(self.copy_all)
         self.save_btn.clicked.connect(self.save_to_file)
-        self.clear_btn.clicked.connect(lambda: self.text.setPlainText(""))
+        self.clear_btn.clicked.connect(self.clear_dump)
 
         if self.diff_text is not None:
             self.diff_text.viewport().installEventFilter(self)
 
-        # таймер анимации подсветки для Diff
-        self._diff_flash_timer.setInterval(40)  # ~25 FPS
-        self._diff_flash_timer.timeout.connect(self._update_diff_flash)
+        # кадры анимации подсветки для Diff; к finished отгорела и самая свежая группа
+        self._diff_flash_anim.valueChanged.connect(lambda _value: self._update_diff_flash())
+        self._diff_flash_anim.finished.connect(self._end_diff_flash)
 
         if self.diff_scan_btn is not None:
             self.diff_scan_btn.clicked.connect(self.diff_scan)
         if self.diff_new_btn is not None:
             self.diff_new_btn.clicked.connect(self.diff_new)
+        if self.diff_highlight_btn is not None and self.diff_highlighter is not None:
+            self.diff_highlight_btn.clicked.connect(self.diff_highlighter.highlight_anyway)
+            self.diff_highlighter.suspended_changed.connect(self.diff_highlight_btn.setVisible)
 
         # стрелки в дереве управляют скрытием в дампе
         self.tree.expanded.connect(self._on_tree_expanded)
@@ -411,110 +856,188 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_save_defaults.clicked.connect(self.save_defaults_clicked)
 
     # Palettes
-    def _apply_light_palette_now(self) -> None:
-        app = QtWidgets.QApplication.instance()
-        if app is not None:
-            _apply_light_palette(app)
-
-    def _apply_dark_palette_now(self) -> None:
+    def _apply_theme(self, theme: str) -> None:
+        # смена стиля и палитры перерисовывает все виджеты — только если тема правда другая
+        if theme == self._current_theme:
+            return
         app = QtWidgets.QApplication.instance()
         if app is not None:
-            _apply_dark_palette(app)
+            if theme == "dark":
+                _apply_dark_palette(app)
+            else:
+                _apply_light_palette(app)
+        self._current_theme = theme
+        # перекрасить дифф с учётом новой темы — пачками, начиная с видимой части
+        if self.diff_highlighter is not None:
+            self.diff_highlighter.set_theme(theme)
+            self.diff_highlighter.schedule_rehighlight(self.diff_text.firstVisibleBlock().blockNumber())
 
     def toggle_theme(self) -> None:
         new_theme = "dark" if self.w.cfg.theme == "light" else "light"
         self.w.cfg.theme = new_theme
         self.theme_btn.setChecked(new_theme == "dark")
         self.theme_btn.setText("🌙" if new_theme == "dark" else "☀️")
-        if new_theme == "dark":
-            self._apply_dark_palette_now()
-        else:
-            self._apply_light_palette_now()
-        # Перекрасить дифф с учётом новой темы сразу, без "Применить"
-        if self.diff_highlighter is not None:
-            self.diff_highlighter.rehighlight()
+        # палитра и подсветка диффа меняются сразу, без "Применить"
+        self._apply_theme(new_theme)
 
     # Tree helpers
-    def _rebuild_tree(self) -> None:
-        path_str = self.path_edit.text().strip()
-        self.tree.blockSignals(True)
-        self.tree_model.removeRows(0, self.tree_model.rowCount())
-        if not path_str:
-            self.tree.blockSignals(False); return
-        root = Path(path_str)
-        if not root.exists() or not root.is_dir():
-            self.tree.blockSignals(False); return
-        self.root_path = root
-
-        root_item = QtGui.QStandardItem(root.name)
-        root_item.setEditable(False)
-        root_item.setData(str(root), QtCore.Qt.ItemDataRole.UserRole)
-        self.tree_model.appendRow(root_item)
-
-        def add_dir(parent_item: QtGui.QStandardItem, p: Path):
-            for child in self.w.list_entries(p):
-                item = QtGui.QStandardItem(child.name)
+    def _rebuild_tree(self, root: Path | None = None) -> None:
+        # root — уже проверенный каталог (из scan); иначе берём и проверяем путь из поля
+        # QSignalBlocker снимает блокировку на любом выходе, в том числе по исключению
+        with QtCore.QSignalBlocker(self.tree):
+            self._tree_sig = None
+            self.tree_model.removeRows(0, self.tree_model.rowCount())
+            self._path_to_index = {}
+            self._lazy_dirs = {}
+            if root is None:
+                path_str = self.path_edit.text().strip()
+                root = _validate_root(path_str) if path_str else None
+                if root is None:
+                    return
+            self.root_path = root
+
+            root_item = QtGui.QStandardItem(root.name)
+            root_item.setEditable(False)
+            root_item.setData(str(root), QtCore.Qt.ItemDataRole.UserRole)
+            root_item.setData(True, _IS_DIR_ROLE)
+            self.tree_model.appendRow(root_item)
+
+            self._path_to_index[str(root)] = QtCore.QPersistentModelIndex(root_item.index())
+            created = self._fill_tree(root_item, root)
+
+            # каждый каталог разворачивается один раз; свёрнутые в новой модели и так свёрнуты
+            self.tree.setUpdatesEnabled(False)
+            try:
+                if str(root) not in self.collapsed_dirs:
+                    self.tree.expand(root_item.index())
+                for idx in created:
+                    self.tree.expand(QtCore.QModelIndex(idx))
+            finally:
+                self.tree.setUpdatesEnabled(True)
+            self._tree_sig = self._tree_signature(root)
+
+    def _fill_tree(self, start_item: QtGui.QStandardItem, start: Path) -> list[QtCore.QPersistentModelIndex]:
+        """
+        Заполнить поддерево start_item содержимым каталога start.
+
+        Обход в ширину без рекурсии; дети каталога добавляются одним appendRows.
+        Верхний уровень прикрепляется к start_item последним: всё поддерево
+        собирается на ещё не подключённых к модели элементах, и модель шлёт
+        один rowsInserted на весь обход.
+        Свёрнутые каталоги не обходятся: вместо детей у них строка-заглушка,
+        настоящее содержимое подгружается при разворачивании.
+        Возвращает индексы созданных развёрнутых каталогов.
+        """
+        Item = QtGui.QStandardItem
+        user_role = QtCore.Qt.ItemDataRole.UserRole
+        excluded = self.excluded_files
+        collapsed = self.collapsed_dirs
+        strike_font = _item_fonts()[0]
+        top: list[QtGui.QStandardItem] = []
+        dir_items: list[tuple[str, QtGui.QStandardItem]] = []
+        pending: deque[tuple[QtGui.QStandardItem, Path]] = deque([(start_item, start)])
+        while pending:
+            parent_item, p = pending.popleft()
+            items: list[QtGui.QStandardItem] = []
+            for child, is_dir in self.w.list_entries_typed(p):
+                key = str(child)
+                item = Item(child.name)
                 item.setEditable(False)
-                item.setData(str(child), QtCore.Qt.ItemDataRole.UserRole)
-                if child.is_file() and child in self.excluded_files:
-                    f = item.font(); f.setStrikeOut(True); item.setFont(f)
-                    item.setForeground(QtGui.QBrush(QtGui.QColor(160,160,160)))
-                parent_item.appendRow(item)
-                if child.is_dir():
-                    add_dir(item, child)
-
-        add_dir(root_item, root)
-        self.tree.expandAll()
-        # применить коллапсы из состояния
-        self._apply_collapse_states()
-        self.tree.blockSignals(False)
+                item.setData(key, user_role)
+                if is_dir:
+                    item.setData(True, _IS_DIR_ROLE)
+                    dir_items.append((key, item))
+                    if key in collapsed:
+                        item.appendRow(self._lazy_placeholder())
+                    else:
+                        pending.append((item, child))
+                elif key in excluded:
+                    item.setFont(strike_font)
+                    item.setForeground(_EXCLUDED_BRUSH)
+                items.append(item)
+            if parent_item is start_item:
+                top = items
+            elif items:
+                parent_item.appendRows(items)
+        if top:
+            start_item.appendRows(top)
+
+        # индексы существуют только у элементов в модели — после подключения поддерева;
+        # каталог -> его индекс: коллапсы применяются без обхода всей модели
+        path_to_index = self._path_to_index
+        created: list[QtCore.QPersistentModelIndex] = []
+        for key, item in dir_items:
+            idx = path_to_index[key] = QtCore.QPersistentModelIndex(item.index())
+            if key in collapsed:
+                self._lazy_dirs[key] = idx
+            else:
+                created.append(idx)
+        return created
+
+    @staticmethod
+    def _lazy_placeholder() -> QtGui.QStandardItem:
+        # без UserRole: обработчики дерева такие строки пропускают
+        item = QtGui.QStandardItem("…")
+        item.setEditable(False)
+        item.setSelectable(False)
+        return item
+
+    def _populate_lazy_dir(self, key: str) -> None:
+        # первый разворот свёрнутого при построении каталога: заглушку — на настоящих детей
+        idx = self._lazy_dirs.pop(key, None)
+        if idx is None or not idx.isValid():
+            return
+        item = self.tree_model.itemFromIndex(QtCore.QModelIndex(idx))
+        item.removeRows(0, item.rowCount())
+        with QtCore.QSignalBlocker(self.tree):
+            for sub in self._fill_tree(item, Path(key)):
+                self.tree.expand(QtCore.QModelIndex(sub))
 
     def _apply_collapse_states(self) -> None:
-        def walk(parent_index: QtCore.QModelIndex):
-            rows = self.tree_model.rowCount(parent_index)
-            for r in range(rows):
-                idx = self.tree_model.index(r, 0, parent_index)
-                data = self.tree_model.data(idx, QtCore.Qt.ItemDataRole.UserRole)
-                if data:
-                    p = Path(str(data))
-                    if p in self.collapsed_dirs:
-                        self.tree.collapse(idx)
-                if self.tree_model.hasChildren(idx):
-                    walk(idx)
-        walk(QtCore.QModelIndex())
+        for p in self.collapsed_dirs:
+            idx = self._path_to_index.get(p)
+            if idx is not None and idx.isValid():
+                self.tree.collapse(QtCore.QModelIndex(idx))
+
+    def _refresh_dump(self) -> None:
+        # состояние дерева изменилось на месте — пересобираем только дамп (с задержкой)
+        if self.root_path is not None:
+            self._dump_debounce.start()
 
+    def _start_pending_dump(self) -> None:
+        if self.root_path is not None:
+            self._start_dump_job(self.root_path)
+
+    # в UserRole уже лежит str пути — ни Path(), ни stat() на каждый сигнал не нужны
     def _on_tree_expanded(self, index: QtCore.QModelIndex) -> None:
-        data = self.tree_model.data(index, QtCore.Qt.ItemDataRole.UserRole)
-        if not data: return
-        p = Path(str(data))
-        if p in self.collapsed_dirs:
-            self.collapsed_dirs.discard(p)
-        self.scan()
+        key = self.tree_model.data(index, QtCore.Qt.ItemDataRole.UserRole)
+        if not key: return
+        self.collapsed_dirs.discard(key)
+        self._populate_lazy_dir(key)
+        self._refresh_dump()
 
     def _on_tree_collapsed(self, index: QtCore.QModelIndex) -> None:
-        data = self.tree_model.data(index, QtCore.Qt.ItemDataRole.UserRole)
-        if not data: return
-        p = Path(str(data))
-        if p.is_dir():
-            self.collapsed_dirs.add(p)
-        self.scan()
+        key = self.tree_model.data(index, QtCore.Qt.ItemDataRole.UserRole)
+        if not key: return
+        if self.tree_model.data(index, _IS_DIR_ROLE):
+            self.collapsed_dirs.add(key)
+        self._refresh_dump()
 
     def _on_tree_double_clicked(self, index: QtCore.QModelIndex) -> None:
-        data = self.tree_model.data(index, QtCore.Qt.ItemDataRole.UserRole)
-        if not data:
+        key = self.tree_model.data(index, QtCore.Qt.ItemDataRole.UserRole)
+        if not key:
             return
-        p = Path(str(data))
-        if p.is_file():
+        if not self.tree_model.data(index, _IS_DIR_ROLE):
             item = self.tree_model.itemFromIndex(index)
-            if p in self.excluded_files:
-                self.excluded_files.remove(p)
-                f = item.font(); f.setStrikeOut(False); item.setFont(f)
-                item.setForeground(QtGui.QBrush())
+            if key in self.excluded_files:
+                self.excluded_files.remove(key)
+                item.setFont(_item_fonts()[1])
+                item.setForeground(_NORMAL_BRUSH)
             else:
-                self.excluded_files.add(p)
-                f = item.font(); f.setStrikeOut(True); item.setFont(f)
-                item.setForeground(QtGui.QBrush(QtGui.QColor(160,160,160)))
-            self.scan()
+                self.excluded_files.add(key)
+                item.setFont(_item_fonts()[0])
+                item.setForeground(_EXCLUDED_BRUSH)
+            self._refresh_dump()
 
     # Scan pipeline
     def scan(self) -> None:
@@ -522,75 +1045,246 @@ class MainWindow(QtWidgets.QMainWindow):
         if not path_str:
             QtWidgets.QMessageBox.warning(self, "Нет директории", "Сначала укажи путь к проекту")
             return
-        root = Path(path_str)
-        if not root.exists() or not root.is_dir():
+        root = _validate_root(path_str)
+        if root is None:
             QtWidgets.QMessageBox.critical(self, "Ошибка", "Путь не существует или это не директория")
             return
 
-        # гарантируем актуальное дерево и состояния
-        self._rebuild_tree()
+        # дерево перестраиваем, только если сменились путь, корень на диске или состояния;
+        # дамп при явном сканировании перечитывается всегда
+        sig = self._tree_signature(root)
+        if sig is None or sig != self._tree_sig:
+            self._rebuild_tree(root)
+        self._start_dump_job(root, force=True)
+
+    def _tree_signature(self, root: Path) -> tuple | None:
+        # mtime корня меняется при добавлении/удалении его прямых детей
+        try:
+            mtime = root.stat().st_mtime_ns
+        except OSError:
+            return None
+        return (str(root), mtime, frozenset(self.collapsed_dirs), frozenset(self.excluded_files))
+
+    def _dump_key(self, root: Path) -> tuple:
+        # всё, от чего зависит текст дампа, кроме содержимого файлов на диске
+        return (
+            str(root), frozenset(self.collapsed_dirs), frozenset(self.excluded_files),
+            self.only_tree_chk.isChecked(), astuple(self.w.cfg),
+        )
 
+    def _start_dump_job(self, root: Path, force: bool = False) -> None:
+        # только сборка дампа: модель дерева не трогаем
+        self._dump_debounce.stop()
+        self._dump_flush_timer.stop()
+        self._dump_tail = ""
         self.w.cfg.output_format = self.format_combo.currentText()
+        key = self._dump_key(root)
+        self._scan_id += 1
+        self._cancel_scan()
+        if not force and key == self._last_dump_key and self._last_dump is not None:
+            # те же входные данные — показываем прошлый результат без обхода диска
+            self._set_dump_text(self._last_dump)
+            self._dump_complete = True
+            self.progress.setRange(0, 1); self.progress.setValue(1)
+            return
+        self._job_key = key
         self.builder = DumpBuilder(self.w.cfg.output_format)
+        self._dump_complete = False
         self.text.setPlainText("")
         self.progress.setRange(0, 0)
         self._total_files = 0; self._file_index = 0
 
-        self.q = queue.Queue()
-        thr = ScanThread(root, self.w, self.q, self.collapsed_dirs, self.excluded_files, self.only_tree_chk.isChecked())
+        # без родителя: старый мост живёт, пока на него ссылается свой поток
+        self._scan_signals = _ScanSignals(self._scan_id)
+        self._scan_signals.ready.connect(self._on_scan_ready, QtCore.Qt.ConnectionType.QueuedConnection)
+        # своё событие на каждый запуск: отменённый поток не увидит его сброса
+        self._scan_cancel = threading.Event()
+        # кеш прочитанных файлов живёт, пока не сменится корень; с диска грузит поток
+        if self._file_cache is None or self._file_cache.root != root:
+            self._file_cache = FileCache(root)
+        # копии состояний: GUI продолжает менять свои множества и Walker, пока поток читает
+        thr = ScanThread(root, self.w.copy(), self._scan_signals, set(self.collapsed_dirs), set(self.excluded_files), self.only_tree_chk.isChecked(), cancel=self._scan_cancel, file_cache=self._file_cache)
         thr.start()
-        if not self.timer.isActive():
-            self.timer.start()
+        self._scan_thread = thr
+
+    def clear_dump(self) -> None:
+        # «Очистить»: поле пустое — copy_all/save_to_file не должны брать прошлый дамп;
+        # незавершённая сборка тоже бросается, иначе её хвост допишется в пустое поле
+        self._scan_id += 1
+        self._cancel_scan()
+        self._dump_debounce.stop()
+        self._dump_flush_timer.stop()
+        self._dump_tail, self._dump_tail_pos = "", 0
+        self._dump_complete = False
+        self._last_dump = self._last_dump_key = None
+        self.text.setPlainText("")
+        self.progress.setRange(0, 1); self.progress.setValue(0)
 
-    def _pump_queue(self) -> None:
+    def _cancel_scan(self) -> None:
+        # остановить незавершённый запуск: у потока свой Walker, поэтому ждём недолго —
+        # зависший на чтении (FIFO, сетевая ФС) daemon-поток бросаем, его сообщения отсеет scan_id
+        thr = self._scan_thread
+        if thr is None or not thr.is_alive():
+            return
+        self._scan_cancel.set()
+        thr.join(timeout=0.1)
+        self._dump_flush_timer.stop()
+        self.builder.close()
+
+    def _on_scan_ready(self, scan_id: int) -> None:
+        if scan_id != self._scan_id:
+            return  # сообщения от прерванного запуска
+        builder = self.builder
+        # подряд идущие куски уходят в builder одним add_chunks, прогресс ставится раз за пачку
+        chunks: list[str] = []
+        progress: object = None
+        for kind, payload in self._scan_signals.take():
+            if kind == "file_chunk" or kind == "file_skipped":  # skipped — «Содержимое скрыто»
+                chunks.append(payload)
+                continue
+            if chunks:
+                builder.add_chunks(chunks)
+                chunks = []
+            if kind == "progress":
+                progress = payload
+            elif kind == "tree":
+                builder.set_tree(payload)
+            elif kind == "total":
+                self._total_files = int(payload)
+                self.progress.setRange(0, self._total_files if self._total_files > 0 else 1)
+            elif kind == "file_header":
+                self._file_index += 1
+                builder.start_file(payload)
+            elif kind == "file_sep":
+                last = (self._file_index == (self._total_files or self._file_index))
+                builder.end_file(is_last=last)
+            elif kind == "done":
+                self._dump_flush_timer.stop()
+                # собранный потоком кеш .gitignore берём для дерева: после "done" поток его не трогает
+                if self._scan_thread is not None:
+                    self.w.git = self._scan_thread.w.git
+                dump = builder.build()
+                if builder.mode == "json":
+                    self._set_dump_text(dump)
+                else:
+                    # недовставленный остаток досылается тиками из хвоста: builder уже не нужен
+                    self._dump_tail, self._dump_tail_pos = builder.drain(), 0
+                    self._flush_dump_text()
+                builder.close()
+                self._last_dump, self._last_dump_key = dump, self._job_key
+                self._dump_complete = True
+                self.progress.setValue(self.progress.maximum())
+                return
+            elif kind == "error":
+                self._dump_flush_timer.stop()
+                builder.close()
+                QtWidgets.QMessageBox.critical(self, "Ошибка", str(payload))
+                return
+        if chunks:
+            builder.add_chunks(chunks)
+        if progress is not None:
+            self.progress.setValue(int(progress))
+        if not self._dump_flush_timer.isActive() and builder.mode != "json":
+            self._dump_flush_timer.start(_FLUSH_MS)
+
+    def _set_dump_text(self, text: str) -> None:
+        # большой текст целиком: одна перерисовка после раскладки документа
+        self.text.setUpdatesEnabled(False)
         try:
-            while True:
-                kind, payload = self.q.get_nowait()
-                if kind == "tree":
-                    self.builder.set_tree(payload)
-                elif kind == "total":
-                    self._total_files = int(payload)
-                    self.progress.setRange(0, self._total_files if self._total_files > 0 else 1)
-                elif kind == "file_header":
-                    self._file_index += 1
-                    self.builder.start_file(payload)
-                elif kind == "file_chunk":
-                    self.builder.add_chunk(payload)
-                elif kind == "file_skipped":
-                    self.builder.add_chunk(payload)  # «Содержимое скрыто»
-                elif kind == "file_sep":
-                    last = (self._file_index == (self._total_files or self._file_index))
-                    self.builder.end_file(is_last=last)
-                elif kind == "progress":
-                    self.progress.setValue(int(payload))
-                elif kind == "done":
-                    self.text.setPlainText(self.builder.build())
-                    self.progress.setValue(self.progress.maximum()); self.timer.stop()
-                elif kind == "error":
-                    QtWidgets.QMessageBox.critical(self, "Ошибка", str(payload)); self.timer.stop()
-        except queue.Empty:
-            pass
+            self.text.setPlainText(text)
+        finally:
+            self.text.setUpdatesEnabled(True)
+
+    def _flush_dump_text(self) -> None:
+        # дописать в поле то, что builder собрал с прошлого раза (или хвост готового дампа),
+        # не больше _FLUSH_CHARS за раз; если осталось ещё — следующий тик сразу
+        if self._dump_tail:
+            pos = self._dump_tail_pos
+            chunk = self._dump_tail[pos:pos + _FLUSH_CHARS]
+            self._dump_tail_pos = pos + len(chunk)
+            more = self._dump_tail_pos < len(self._dump_tail)
+            if not more:
+                self._dump_tail = ""
+        elif self.builder is not None and getattr(self.builder, "buf", None) is not None:
+            chunk = self.builder.drain(_FLUSH_CHARS)
+            more = len(chunk) == _FLUSH_CHARS
+        else:
+            return
+        if chunk:
+            cursor = QtGui.QTextCursor(self.text.document())
+            cursor.movePosition(QtGui.QTextCursor.MoveOperation.End)
+            cursor.insertText(chunk)
+        if more:
+            self._dump_flush_timer.start(0)
 
     # Search / Save / Copy
+    def _dump_plain_text(self) -> tuple[str, list[int]]:
+        # текст поля дампа, снимается заново только после изменения документа;
+        # второй элемент — индексы символов вне BMP: в Qt каждый такой символ
+        # занимает две позиции, и позиции str надо сдвигать
+        doc = self.text.document()
+        rev = doc.revision()
+        if self._find_cache is None or self._find_cache[0] != rev:
+            text = doc.toPlainText()
+            if text.isascii() or max(text, default="") <= "\uffff":
+                astral: list[int] = []
+            else:
+                astral = [m.start() for m in _RE_ASTRAL.finditer(text)]
+            # те же символы в позициях документа: i-й стоит на astral[i] + i
+            self._find_cache = (rev, text, astral, [a + i for i, a in enumerate(astral)])
+        return self._find_cache[1], self._find_cache[2]
+
     def find_next(self) -> None:
         q = self.search_edit.text()
         if not q: return
         cursor = self.text.textCursor(); start_pos = cursor.selectionEnd()
-        doc = self.text.document(); found = doc.find(q, start_pos)
-        if not found.isNull(): self.text.setTextCursor(found)
-        else:
-            found = doc.find(q, 0)
-            if not found.isNull(): self.text.setTextCursor(found)
+        text, astral = self._dump_plain_text()
+        starts = self._match_starts(q, text)
+        if not starts:
+            return
+        if astral:
+            # позиция документа -> str: минус символы вне BMP левее неё
+            start_pos -= bisect.bisect_left(self._find_cache[3], start_pos)
+        # следующее совпадение, начинающееся не раньше конца выделения; после последнего — по кругу
+        k = bisect.bisect_left(starts, start_pos)
+        pos = starts[k % len(starts)]
+        end = pos + len(q)
+        if astral:
+            # str -> документ: +1 за каждый символ вне BMP левее позиции
+            pos += bisect.bisect_left(astral, pos)
+            end += bisect.bisect_left(astral, end)
+        found = QtGui.QTextCursor(self.text.document())
+        found.setPosition(pos)
+        found.setPosition(end, QtGui.QTextCursor.MoveMode.KeepAnchor)
+        self.text.setTextCursor(found)
+
+    def _match_starts(self, q: str, text: str) -> list[int]:
+        # все начала q в дампе (с перекрытиями), один проход на пару (документ, запрос):
+        # повторные «Найти» с тем же запросом — только bisect
+        rev = self._find_cache[0]
+        if self._find_matches is None or self._find_matches[:2] != (rev, q):
+            # без учёта регистра, как у QTextDocument.find без флагов; длина совпадения всегда len(q)
+            pattern = re.compile("(?=" + re.escape(q) + ")", re.IGNORECASE)
+            self._find_matches = (rev, q, [m.start() for m in pattern.finditer(text)])
+        return self._find_matches[2]
 
     def copy_all(self) -> None:
-        data = self.text.toPlainText()
-        if not data.strip():
+        # готовый дамп — из _last_dump: поле может ещё дорисовывать хвост
+        data = self._last_dump if self._dump_complete else self.text.toPlainText()
+        if not data or data.isspace():
             QtWidgets.QMessageBox.information(self, "Пусто", "Нечего копировать"); return
         QtWidgets.QApplication.clipboard().setText(data)
 
     def save_to_file(self) -> None:
-        data = self.text.toPlainText()
-        if not data.strip():
+        # готовый дамп уже лежит строкой в _last_dump; недособранный берём из поля
+        # кусками по блокам — без второй копии во всю длину через toPlainText()
+        if self._dump_complete:
+            data: str | list[str] = self._last_dump
+            empty = not data or data.isspace()
+        else:
+            data = _document_pieces(self.text.document())
+            empty = all(not piece or piece.isspace() for piece in data)
+        if empty:
             QtWidgets.QMessageBox.information(self, "Пусто", "Нечего сохранять"); return
         ext = self.w.cfg.output_format
         path, _ = QtWidgets.QFileDialog.getSaveFileName(
@@ -598,12 +1292,27 @@ class MainWindow(QtWidgets.QMainWindow):
             "Текст (*.txt);;Markdown (*.md);;JSON (*.json);;Все файлы (*.*)"
         )
         if not path: return
-        Path(path).write_text(data, encoding="utf-8")
+        job = _SaveJob(path, data)
+        # сигналы держим до конца записи: сам QRunnable пул удалит после run()
+        signals = job.signals
+        self._save_signals.add(signals)
+        signals.finished.connect(lambda p, s=signals: self._on_saved(s, p))
+        signals.failed.connect(lambda p, err, s=signals: self._on_save_failed(s, p, err))
+        QtCore.QThreadPool.globalInstance().start(job)
+
+    def _on_saved(self, signals: _SaveSignals, path: str) -> None:
+        self._save_signals.discard(signals)
+        self.statusBar().showMessage(f"Сохранено: {path}", 3000)
+
+    def _on_save_failed(self, signals: _SaveSignals, path: str, error: str) -> None:
+        self._save_signals.discard(signals)
+        QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить {path}: {error}")
 
     # Settings
     def apply_settings(self) -> None:
         try:
             cfg = self.w.cfg
+            tree_before = _tree_settings(cfg)
             cfg.ignore_hidden = self.chk_ignore_hidden.isChecked()
             cfg.follow_symlinks = self.chk_follow_links.isChecked()
             cfg.dirs_first_in_tree = self.chk_dirs_first.isChecked()
@@ -614,6 +1323,7 @@ class MainWindow(QtWidgets.QMainWindow):
             cfg.errors_policy = self.combo_errors.currentText()
             cfg.output_format = self.format_combo.currentText()
             cfg.include_collapsed_in_dump = self.chk_include_collapsed.isChecked()
+            cfg.dump_cache = self.chk_dump_cache.isChecked()
             
             # настройки Diff
             if self.diff_group_modifier_combo is not None:
@@ -621,21 +1331,21 @@ class MainWindow(QtWidgets.QMainWindow):
                 cfg.diff_group_modifier = modifier or "Ctrl"
             if self.diff_flash_ms_spin is not None:
                 cfg.diff_copy_flash_duration_ms = int(self.diff_flash_ms_spin.value())
+            if self.diff_highlight_max_spin is not None:
+                cfg.diff_highlight_max_chars = int(self.diff_highlight_max_spin.value())
+                if self.diff_highlighter is not None:
+                    self.diff_highlighter.update_size_gate()
 
             # тема берётся из состояния кнопки
             cfg.theme = "dark" if self.theme_btn.isChecked() else "light"
-            if cfg.theme == "dark":
-                self._apply_dark_palette_now()
-            else:
-                self._apply_light_palette_now()
-            # пересветим дифф с учётом новой темы
-            if self.diff_highlighter is not None:
-                self.diff_highlighter.rehighlight()
+            self._apply_theme(cfg.theme)
 
-            def _split_csv(s: str) -> tuple[str, ...]:
-                return tuple([x.strip() for x in s.split(",") if x.strip()])
             cfg.ignore_dirs = _split_csv(self.txt_ignore_dirs.toPlainText())
             cfg.ignore_files = _split_csv(self.txt_ignore_files.toPlainText())
+            # матчеры собираются сейчас, а не на первом файле следующего обхода
+            cfg.compiled_dir_matcher(); cfg.compiled_file_matcher()
+            if _tree_settings(cfg) != tree_before:
+                self._tree_sig = None  # фильтры дерева сменились — следующий scan перестроит его
             QtWidgets.QMessageBox.information(self, "Ок", "Настройки применены. Пересканируй проект.")
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Ошибка", str(e))
@@ -655,12 +1365,12 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.information(self, "Пусто", "Нет текста диффа для сканирования")
             return
 
-        self._diff_lines = raw.splitlines()
-        self._diff_block_indices = detect_diff_block_indices(self._diff_lines)
+        self._diff_model = DiffModel.from_lines(raw.splitlines())
+        self._diff_lines = self._diff_model.lines
         self._diff_locked = True
         self.diff_text.setReadOnly(True)
         if self.diff_highlighter is not None:
-            self.diff_highlighter.rehighlight()
+            self.diff_highlighter.schedule_rehighlight(self.diff_text.firstVisibleBlock().blockNumber())
 
     def diff_new(self) -> None:
         """
@@ -669,32 +1379,20 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.diff_text is None:
             return
         self._diff_locked = False
-        self._diff_lines = []
-        self._diff_block_indices = set()
+        self._diff_model = DiffModel()
+        self._diff_lines = self._diff_model.lines
         self.diff_text.setReadOnly(False)
         self.diff_text.clear()
         if self.diff_highlighter is not None:
-            self.diff_highlighter.rehighlight()
+            self.diff_highlighter.schedule_rehighlight()  # пустой документ — сразу, заодно гасит начатую перекраску
 
     def _is_group_modifier_pressed(self, modifiers: QtCore.Qt.KeyboardModifiers) -> bool:
         """
         Проверить, соответствует ли текущий набор модификаторов настройке diff_group_modifier.
         """
-        cfg_mod = getattr(self.w.cfg, "diff_group_modifier", "Ctrl")
-        has_ctrl = bool(modifiers & QtCore.Qt.KeyboardModifier.ControlModifier)
-        has_shift = bool(modifiers & QtCore.Qt.KeyboardModifier.ShiftModifier)
-        has_alt = bool(modifiers & QtCore.Qt.KeyboardModifier.AltModifier)
-
-        if cfg_mod == "Ctrl":
-            return has_ctrl and not has_shift and not has_alt
-        if cfg_mod == "Shift":
-            return has_shift and not has_ctrl and not has_alt
-        if cfg_mod == "Alt":
-            return has_alt and not has_ctrl and not has_shift
-        if cfg_mod == "Ctrl+Shift":
-            return has_ctrl and has_shift and not has_alt
-        # значение по умолчанию: только Ctrl
-        return has_ctrl and not has_shift and not has_alt
+        # одно сравнение масок; неизвестное значение настройки — как Ctrl
+        want = _GROUP_MODIFIERS.get(self.w.cfg.diff_group_modifier, _KM.ControlModifier)
+        return (modifiers & _GROUP_MODIFIER_MASK) == want
 
     def _handle_diff_click(self, event: QtGui.QMouseEvent) -> bool:
         """
@@ -718,12 +1416,14 @@ class MainWindow(QtWidgets.QMainWindow):
         modifiers = event.modifiers()
         use_group = self._is_group_modifier_pressed(modifiers)
 
+        model = self._diff_model
         if use_group:
-            indices = get_group_indices(self._diff_lines, line_idx)
+            indices = model.group_indices(line_idx)
         else:
             indices = [line_idx]
 
-        pieces = [strip_for_copy(self._diff_lines[i]) for i in indices]
+        copies = model.copies
+        pieces = [copies[i] for i in indices]
         text = "\n".join(pieces) + "\n"
         QtWidgets.QApplication.clipboard().setText(text)
 
@@ -737,61 +1437,43 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         if not indices:
             return
-        for i in indices:
-            self._diff_flash_slots[i] = 0  # возраст 0 мс
-        if not self._diff_flash_timer.isActive():
-            self._diff_flash_timer.start()
+        lines = array("i", sorted(set(indices)))
+        fresh = set(lines)
+        # повторно скопированные строки начинают заново: из старых групп их убираем
+        groups = []
+        for g in self._diff_flash_groups:
+            if not fresh.isdisjoint(g[1]):
+                g[1] = array("i", (i for i in g[1] if i not in fresh))
+            if g[1]:
+                groups.append(g)
+        groups.append([self._diff_flash_clock.elapsed(), lines])
+        self._diff_flash_groups = groups
+        # новая группа — самая молодая: анимация идёт заново на её полный срок
+        anim = self._diff_flash_anim
+        anim.stop()
+        anim.setDuration(getattr(self.w.cfg, "diff_copy_flash_duration_ms", 300) or 300)
+        anim.start()
+
+    def _end_diff_flash(self) -> None:
+        self._diff_flash_groups = []
+        self._update_diff_flash()
 
     def _update_diff_flash(self) -> None:
         """
-        Обновление анимации подсветки копируемых строк.
+        Обновление анимации подсветки копируемых строк: прозрачность групп по
+        их возрасту; рисует полосы само поле (DiffTextEdit.set_flash).
         """
-        if self.diff_text is None or not self._diff_flash_slots:
-            self._diff_flash_timer.stop()
-            if self.diff_text is not None:
-                self.diff_text.setExtraSelections([])
+        if self.diff_text is None:
             return
-
         duration = getattr(self.w.cfg, "diff_copy_flash_duration_ms", 300) or 300
-        dt = self._diff_flash_timer.interval()
-
-        new_slots: dict[int, int] = {}
-        selections: list[QtWidgets.QTextEdit.ExtraSelection] = []
-        base_color = QtGui.QColor(255, 255, 0)  # жёлтый хайлайт
-
-        for line_idx, age in self._diff_flash_slots.items():
-            age += dt
-            if age >= duration:
-                continue
-            new_slots[line_idx] = age
-            t = max(0.0, 1.0 - age / duration)  # 1 -> 0
-            alpha = int(255 * t)
-            color = QtGui.QColor(base_color)
-            color.setAlpha(alpha)
-
-            block = self.diff_text.document().findBlockByNumber(line_idx)
-            if not block.isValid():
-                continue
-            cursor = QtGui.QTextCursor(block)
-            sel = QtWidgets.QTextEdit.ExtraSelection()
-            fmt = QtGui.QTextCharFormat()
-            fmt.setBackground(color)
-            # ВАЖНО: чтобы подсветился весь блок (строка), а не "0 символов",
-            # нужно использовать флаг FullWidthSelection.
-            fmt.setProperty(QtGui.QTextFormat.Property.FullWidthSelection, True)
-            sel.cursor = cursor
-            sel.format = fmt
-            selections.append(sel)
-
-        self._diff_flash_slots = new_slots
-
-        if not self._diff_flash_slots:
-            self._diff_flash_timer.stop()
-
-        # применяем подсветку
-        self.diff_text.setExtraSelections(selections)
-
+        now = self._diff_flash_clock.elapsed()
 
+        # старение — по группам, а не по строкам
+        self._diff_flash_groups = groups = [g for g in self._diff_flash_groups if now - g[0] < duration]
+        self.diff_text.set_flash([
+            (lines, int(255 * max(0.0, 1.0 - (now - start) / duration)))  # 1 -> 0
+            for start, lines in groups
+        ])
 
     def eventFilter(self, obj: QtCore.QObject, event: QtCore.QEvent) -> bool:
         """
@@ -811,13 +1493,6 @@ class MainWindow(QtWidgets.QMainWindow):
             # сохраняем актуальный конфиг
             save_defaults(self.w.cfg)
             QtWidgets.QMessageBox.information(self, "Сохранено", "Сохранено в ~/.project_dumper.json")
-            # применяем ещё раз из сохранённого значения
-            if self.w.cfg.theme == "dark":
-                self._apply_dark_palette_now()
-            else:
-                self._apply_light_palette_now()
-            if self.diff_highlighter is not None:
-                self.diff_highlighter.rehighlight()
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Ошибка", str(e))
 
@@ -834,5 +1509,6 @@ def run_app() -> None:
         _apply_light_palette(app)
 
     w = MainWindow()
+    w._current_theme = cfg.theme  # палитра уже выставлена выше
     w.show()
     app.exec()
\ No newline at end of file
@@ -1,24 +1,73 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Iterable
+import codecs
+from typing import BinaryIO, Iterable, Iterator
 from .config import Config
 
+try:
+    import mmap
+except Exception:
+    mmap = None
+
 try:
     from charset_normalizer import from_bytes
 except Exception:
     from_bytes = None
 
+# сколько байт начала файла получает детектор кодировки
+_SNIFF_BYTES = 8 * 1024
+
+# расширения заведомо бинарных файлов: такие не открываются вовсе
+_BINARY_EXTS = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".ico",
+    ".zip", ".gz", ".bz2", ".xz", ".7z", ".tar",
+    ".so", ".dylib", ".dll", ".exe", ".pyc", ".pyo", ".class", ".o", ".a", ".pdf",
+})
+
+# с какого размера остаток файла читается через mmap, а не read() на каждый кусок
+_MMAP_MIN_SIZE = 1 << 20
+
+# кодировки (имена по codecs.lookup), в которых ASCII-байты значат те же символы
+_ASCII_SUPERSETS = frozenset({"utf-8", "ascii", "iso8859-1"})
+
 _TEXT_CHARS = bytearray({7,8,9,10,12,13,27} | set(range(0x20, 0x100)))
 
 def is_binary_sample(b: bytes, threshold: float) -> bool:
+    # NUL — признак бинаря при любом пороге; поиск байта идёт через memchr
     if b"\x00" in b:
         return True
-    if not b:
-        return False
-    nontext = sum(ch not in _TEXT_CHARS for ch in b)
-    return (nontext / len(b)) > threshold
+    n = len(b)
+    limit = threshold * n  # допустимое число нетекстовых байт
+    if limit >= n:
+        return False  # порог не меньше 1: бинарём по доле ничего не считается
+    # translate выбрасывает текстовые байты за один проход на C — остаются только нетекстовые
+    return len(b.translate(None, _TEXT_CHARS)) > limit
+
+def _read_chunks(fh: BinaryIO, chunk_size: int, size: int) -> Iterator[bytes]:
+    # остаток файла кусками; большие файлы — срезами отображения в память,
+    # без системного вызова на каждый кусок
+    if mmap is not None and chunk_size > 0 and size >= _MMAP_MIN_SIZE:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mm = None  # файл успел опустеть или ФС не умеет mmap — читаем как обычно
+        if mm is not None:
+            with mm:
+                pos, end = fh.tell(), len(mm)
+                while pos < end:
+                    yield mm[pos:pos + chunk_size]
+                    pos += chunk_size
+            return
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
 
 def read_text_streaming(p: Path, cfg: Config, chunk_size: int = 1024 * 64) -> Iterable[str]:
+    if p.suffix.lower() in _BINARY_EXTS:
+        yield "[SKIPPED: binary by extension]"
+        return
     size = p.stat().st_size
     if cfg.max_file_size and size > cfg.max_file_size:
         yield f"[SKIPPED: size {size} bytes > limit {cfg.max_file_size}]"
@@ -31,32 +80,52 @@ def read_text_streaming(p: Path, cfg: Config, chunk_size: int = 1024 * 64) -> It
         if is_binary_sample(head, cfg.binary_threshold):
             yield "[SKIPPED: binary content detected]"
             return
-        # Определяем кодировку: сначала заданная, при неудаче — авто
-        decoder_enc = cfg.encoding
         rest_size = 0
         if chunk_size > len(head):
             rest_size = chunk_size - len(head)
         data = head + (fh.read(rest_size) if rest_size > 0 else b"")
-        # пробуем заданную
+        # Определяем кодировку: сначала заданная, при неудаче — авто.
+        # Инкрементальный декодер держит недочитанный хвост многобайтного символа
+        # до следующего куска: граница кусков не рвёт символы и не роняет декодирование
+        # Чистый ASCII в ASCII-совместимой кодировке декодируется напрямую, мимо декодера;
+        # первый кусок с другими байтами переключает на декодер насовсем — хвоста в нём ещё нет
+        policy = cfg.errors_policy
         try:
-            text = data.decode(decoder_enc, errors=cfg.errors_policy)
-            yield text
+            enc = cfg.encoding
+            dec = codecs.getincrementaldecoder(enc)(errors=policy)
+            fast = data.isascii() and codecs.lookup(enc).name in _ASCII_SUPERSETS
+            text = data.decode("ascii") if fast else dec.decode(data, final=False)
         except Exception:
+            # детектору обычно хватает первых килобайт; если найденная по ним кодировка
+            # не берёт кусок целиком, детектор смотрит весь кусок
+            text = None
             if cfg.detect_encoding and from_bytes is not None:
-                best = from_bytes(data).best()
-                if best:
-                    decoder_enc = str(best.encoding)
-                    yield best.output()
-                else:
-                    yield data.decode(cfg.encoding, errors=cfg.errors_policy)
-            else:
-                yield data.decode(cfg.encoding, errors=cfg.errors_policy)
+                samples = [data[:_SNIFF_BYTES]] + ([data] if len(data) > _SNIFF_BYTES else [])
+                for sample in samples:
+                    best = from_bytes(sample).best()
+                    if best is None:
+                        continue
+                    enc = str(best.encoding)
+                    dec = codecs.getincrementaldecoder(enc)(errors=policy)
+                    try:
+                        text = dec.decode(data, final=False)
+                        break
+                    except UnicodeDecodeError:
+                        text = None
+            if text is None:
+                raise
+            fast = False
+        yield text
         # дальше потоково
-        while True:
-            chunk = fh.read(chunk_size)
-            if not chunk:
-                break
-            try:
-                yield chunk.decode(decoder_enc, errors=cfg.errors_policy)
-            except Exception:
-                yield chunk.decode(cfg.encoding, errors=cfg.errors_policy)
+        decode = dec.decode
+        for chunk in _read_chunks(fh, chunk_size, size):
+            if fast and chunk.isascii():
+                yield chunk.decode("ascii")
+                continue
+            fast = False
+            text = decode(chunk, False)
+            if text:
+                yield text
+        text = decode(b"", True)
+        if text:
+            yield text
@@ -1,139 +1,278 @@
 from __future__ import annotations
-import os, fnmatch, threading, queue
+import copy, os, threading, queue, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 from .config import Config, load_defaults
 from .gitignore_cache import GitignoreCache
+from .file_cache import FileCache, reader_key
+
+# потоки iter_files: scandir/stat отпускают GIL, на холодном кеше ФС каталоги читаются параллельно
+_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def _scan_dir(path: Path, follow: bool) -> list[tuple[str, bool]]:
+    # (имя, is_dir) записей каталога; ссылки на каталоги без follow_symlinks пропускаются,
+    # ошибки чтения каталога — тоже, как в os.walk
+    out: list[tuple[str, bool]] = []
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    is_dir = e.is_dir()
+                    if is_dir and not follow and e.is_symlink():
+                        continue
+                except OSError:
+                    is_dir = False
+                out.append((e.name, is_dir))
+    except OSError:
+        pass
+    return out
+
+def _typed_entries(it: Iterable[os.DirEntry], follow: bool) -> Iterator[tuple[str, bool]]:
+    # (имя, is_dir) прямо из итератора scandir; без follow_symlinks ссылки пропускаются
+    for e in it:
+        if not follow and e.is_symlink():
+            continue
+        try:
+            yield e.name, e.is_dir()
+        except OSError:
+            yield e.name, False
+
+# отрисовка ветвей build_tree
+_BRANCH_MID, _BRANCH_LAST = "├── ", "└── "
+_EXT_MID, _EXT_LAST = "│   ", "    "
 
 class Walker:
     def __init__(self) -> None:
         self.cfg = Config()
         self.git = GitignoreCache()
 
-    def load_cfg(self, root: Path) -> None:
+    def load_cfg(self, root: Path, cancel: threading.Event | None = None) -> None:
         self.cfg = load_defaults()
-        self.git.build(root)
+        self.git.build(root, frozenset(self.cfg.ignore_dirs), self.cfg.ignore_hidden, cancel)
+
+    def copy(self) -> "Walker":
+        # свой Walker на каждый ScanThread: load_cfg() запуска меняет только копию,
+        # и брошенный поток не делит кеш .gitignore с новым
+        w = Walker()
+        w.cfg = copy.copy(self.cfg)
+        w.git = self.git.copy()
+        return w
 
     def _is_hidden(self, p: Path) -> bool:
         return any(part.startswith(".") for part in p.parts)
 
-    def _match_any(self, name: str, patterns: tuple[str, ...]) -> bool:
-        return any(fnmatch.fnmatch(name, pat) for pat in patterns)
-
-    def skip_dir(self, path: Path) -> bool:
-        name = path.name
+    def _skip_name(self, name: str, is_dir: bool) -> bool:
+        # правила по одному имени, без .gitignore
         if self.cfg.ignore_hidden and name.startswith("."):
             return True
-        if name in self.cfg.ignore_dirs or self._match_any(name, self.cfg.ignore_dirs):
-            return True
-        if self.git.ignored(path):
-            return True
-        return False
+        return self.cfg.is_dir_ignored(name) if is_dir else self.cfg.is_file_ignored(name)
+
+    def skip_dir(self, path: Path) -> bool:
+        return self._skip_name(path.name, True) or self.git.ignored(path, is_dir=True)
 
     def skip_file(self, path: Path) -> bool:
-        name = path.name
-        if self.cfg.ignore_hidden and name.startswith("."):
-            return True
-        if self._match_any(name, self.cfg.ignore_files):
-            return True
-        if self.git.ignored(path):
-            return True
-        return False
+        return self._skip_name(path.name, False) or self.git.ignored(path, is_dir=False)
+
+    def _filter(self, dir_path: Path, entries: Iterable[tuple[str, bool]]) -> list[tuple[str, Path, bool]]:
+        # skip_dir/skip_file для содержимого одного каталога: сначала правила _skip_name по имени
+        # (матчеры берутся один раз), Path строится только для прошедших их,
+        # .gitignore проверяется одной пачкой
+        cfg = self.cfg
+        hidden = cfg.ignore_hidden
+        dir_names = cfg.ignore_dirs_set()
+        dir_match = cfg.compiled_dir_matcher().match
+        file_match = cfg.compiled_file_matcher().match
+        cand: list[tuple[str, bool]] = []
+        for name, d in entries:
+            if hidden and name.startswith("."):
+                continue
+            if (name in dir_names or dir_match(name)) if d else file_match(name):
+                continue
+            cand.append((name, d))
+        paths = [dir_path / name for name, _ in cand]
+        ignored = self.git.ignored_many(paths, [d for _, d in cand])
+        return [(name, p, d) for (name, d), p, ign in zip(cand, paths, ignored) if not ign]
+
+    def list_entries_typed(self, dir_path: Path) -> list[tuple[Path, bool]]:
+        # (путь, is_dir) за один проход scandir: тип берётся из записи каталога без
+        # повторных stat(), правила по имени применяются тут же, сортировка — без обращений к диску
+        with os.scandir(dir_path) as it:
+            out = self._filter(dir_path, _typed_entries(it, self.cfg.follow_symlinks))
+        dirs_first = self.cfg.dirs_first_in_tree
+        out.sort(key=lambda e: (0 if (dirs_first and e[2]) else 1, e[0].lower()))
+        return [(p, d) for _, p, d in out]
 
     def list_entries(self, dir_path: Path) -> list[Path]:
-        entries = [p for p in dir_path.iterdir() if (self.cfg.follow_symlinks or not p.is_symlink())]
-        out = []
-        for p in entries:
-            if p.is_dir():
-                if self.skip_dir(p): continue
-            else:
-                if self.skip_file(p): continue
-            out.append(p)
-        def key(p: Path):
-            return (0 if (self.cfg.dirs_first_in_tree and p.is_dir()) else 1, p.name.lower())
-        return sorted(out, key=key)
-
-    def build_tree(self, root: Path, collapsed: set[Path] | None = None, excluded: set[Path] | None = None) -> str:
-        collapsed = collapsed or set()
-        excluded = excluded or set()
-        lines: list[str] = []
-
-        def rec(cur: Path, prefix: str = "") -> None:
-            all_entries = self.list_entries(cur)
-            entries = [e for e in all_entries if not (e.is_file() and e in excluded)]
-            for i, p in enumerate(entries):
-                last = (i == len(entries) - 1)
-                branch = "└── " if last else "├── "
-                lines.append(prefix + branch + p.name)
-                if p.is_dir():
-                    ext = prefix + ("    " if last else "│   ")
-                    if p in collapsed:
-                        lines.append(ext + "…")
-                    else:
-                        rec(p, ext)
+        return [p for p, _ in self.list_entries_typed(dir_path)]
+
+    def build_tree(self, root: Path, collapsed: Iterable[str | Path] | None = None, excluded: Iterable[str | Path] | None = None, cancel: threading.Event | None = None) -> str:
+        # взведённый cancel обрывает обход на ближайшем каталоге: текст неполный
+        # сравниваем строки путей: принимаются и str, и Path
+        collapsed = {os.fspath(p) for p in collapsed or ()}
+        excluded = {os.fspath(p) for p in excluded or ()}
+        lines = [root.name + "/"]
+
+        def children(cur: Path, prefix: str) -> list[tuple[Path, bool, str, bool]]:
+            # записи каталога в порядке вывода: (путь, is_dir, префикс, последняя ли)
+            entries = [(e, d) for e, d in self.list_entries_typed(cur) if d or str(e) not in excluded]
+            n = len(entries)
+            return [(p, d, prefix, i == n - 1) for i, (p, d) in enumerate(entries)]
 
-        lines.append(root.name + "/")
-        rec(root)
+        # явный стек вместо рекурсии: дети кладутся в обратном порядке, чтобы выходить по порядку
+        stack = children(root, "")[::-1]
+        while stack:
+            p, is_dir, prefix, last = stack.pop()
+            lines.append(prefix + (_BRANCH_LAST if last else _BRANCH_MID) + p.name)
+            if is_dir:
+                ext = prefix + (_EXT_LAST if last else _EXT_MID)
+                if str(p) in collapsed:
+                    lines.append(ext + "…")
+                elif cancel is not None and cancel.is_set():
+                    break
+                else:
+                    stack.extend(reversed(children(p, ext)))
         return "\n".join(lines)
         
-    def iter_files(self, root: Path) -> list[Path]:
+    def iter_files(self, root: Path, cancel: threading.Event | None = None) -> list[Path]:
+        # обход в ширину: каталоги читаются в пуле потоков, фильтрация — здесь,
+        # в вызывающем потоке (кеш .gitignore не потокобезопасен);
+        # взведённый cancel обрывает обход — список неполный
         files: list[Path] = []
-        for dirpath, dirnames, filenames in os.walk(root, followlinks=self.cfg.follow_symlinks):
-            d = Path(dirpath)
-            dirnames[:] = [n for n in dirnames if not self.skip_dir(d / n)]
-            for f in filenames:
-                p = d / f
-                if not self.skip_file(p):
-                    files.append(p)
+        follow = self.cfg.follow_symlinks
+        with ThreadPoolExecutor(max_workers=_SCAN_WORKERS) as pool:
+            pending = {pool.submit(_scan_dir, root, follow): root}
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    for fut in pending:
+                        fut.cancel()
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    d = pending.pop(fut)
+                    for _, p, is_dir in self._filter(d, fut.result()):
+                        if is_dir:
+                            pending[pool.submit(_scan_dir, p, follow)] = p
+                        else:
+                            files.append(p)
         files.sort(key=lambda p: p.relative_to(root).as_posix().lower())
         return files
 
-# Фоновый воркер с прогрессом
+# пачка сообщений ScanThread для приёмника с put_many: не больше столько сообщений
+# и не дольше столько секунд
+_BATCH_SIZE = 256
+_BATCH_SECONDS = 0.01
+
+# Фоновый воркер с прогрессом; queue_out — любой объект с put((kind, payload)):
+# queue.Queue или мост сигналов из GUI (у приёмника с put_many сообщения идут
+# пачками). Взведённый cancel останавливает обход на ближайшем каталоге, файле или куске;
+# "done" после отмены не отправляется.
 class ScanThread(threading.Thread):
-    def __init__(self, root: Path, walker: Walker, queue_out: "queue.Queue[tuple[str,object]]", collapsed_dirs: set[Path], excluded_files: set[Path], only_tree: bool):
+    def __init__(self, root: Path, walker: Walker, queue_out: "queue.Queue[tuple[str,object]]", collapsed_dirs: Iterable[str | Path], excluded_files: Iterable[str | Path], only_tree: bool, cancel: threading.Event | None = None, file_cache: FileCache | None = None):
         super().__init__(daemon=True)
+        self.cancel = cancel if cancel is not None else threading.Event()
         self.root = root
         self.w = walker
         self.q = queue_out
-        self.collapsed = collapsed_dirs
-        self.excluded = excluded_files
+        # приёмник с put_many получает сообщения пачками, иначе — по одному через put
+        self._put_many = getattr(queue_out, "put_many", None)
+        self._batch: list[tuple[str, object]] = []
+        self._batch_t = 0.0
+        self.collapsed = {os.fspath(p) for p in collapsed_dirs}
+        self.excluded = {os.fspath(p) for p in excluded_files}
         self.only_tree = only_tree
+        self.file_cache = file_cache
+
+    def _put(self, item: tuple[str, object]) -> None:
+        if self._put_many is None:
+            self.q.put(item)
+            return
+        batch = self._batch
+        if not batch:
+            self._batch_t = time.monotonic()
+        batch.append(item)
+        if len(batch) >= _BATCH_SIZE or time.monotonic() - self._batch_t >= _BATCH_SECONDS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._put_many(batch)
 
     def run(self):
         try:
-            self.w.load_cfg(self.root)
-            tree = self.w.build_tree(self.root, self.collapsed, self.excluded)
-            self.q.put(("tree", tree))
+            self._run()
+        finally:
+            if not self.cancel.is_set():
+                self._flush()
+
+    def _run(self):
+        try:
+            self.w.load_cfg(self.root, self.cancel)
+            if self.cancel.is_set():
+                return
+            tree = self.w.build_tree(self.root, self.collapsed, self.excluded, self.cancel)
+            if self.cancel.is_set():
+                return
+            self._put(("tree", tree))
+            self._flush()  # дерево показываем, не дожидаясь чтения файлов
             if self.only_tree:
-                self.q.put(("done", None))
+                self._put(("done", None))
+                return
+            files = self.w.iter_files(self.root, self.cancel)
+            if self.cancel.is_set():
                 return
-            files = self.w.iter_files(self.root)
             total = len(files)
-            self.q.put(("total", total))
+            self._put(("total", total))
             from .reader import read_text_streaming
+            cache = self.file_cache if self.w.cfg.dump_cache else None
+            if cache is not None:
+                cache.load(reader_key(self.w.cfg))
+            # файл лежит под свёрнутым каталогом <=> его путь начинается с "<каталог>/"
+            hidden_prefixes = tuple(d.rstrip(os.sep) + os.sep for d in self.collapsed)
+            cancelled = self.cancel.is_set
             for i, p in enumerate(files, 1):
+                if cancelled():
+                    return
                 rel = p.relative_to(self.root).as_posix()
-                hide = any((p.is_relative_to(d) for d in self.collapsed)) if hasattr(p, "is_relative_to") \
-                       else any(str(p).startswith(str(d)) for d in self.collapsed)
+                sp = str(p)
+                hide = sp.startswith(hidden_prefixes)
 
                 # исключённые одиночные файлы пропускаем полностью
-                if p in self.excluded:
-                    self.q.put(("progress", i))
+                if sp in self.excluded:
+                    self._put(("progress", i))
                     continue
 
                 if hide and not self.w.cfg.include_collapsed_in_dump:
                     # полностью пропускаем: ни заголовка, ни "Содержимое скрыто", ни file_sep
-                    self.q.put(("progress", i))
+                    self._put(("progress", i))
                     continue
 
-                self.q.put(("file_header", rel))
+                self._put(("file_header", rel))
                 if hide:  # include_collapsed_in_dump == True
-                    self.q.put(("file_skipped", "Содержимое скрыто"))
-                else:
+                    self._put(("file_skipped", "Содержимое скрыто"))
+                elif cache is None:
                     for chunk in read_text_streaming(p, self.w.cfg):
-                        self.q.put(("file_chunk", chunk))
-                self.q.put(("file_sep", None))
-                self.q.put(("progress", i))
-            self.q.put(("done", None))
+                        if cancelled():
+                            return
+                        self._put(("file_chunk", chunk))
+                else:
+                    st = p.stat()
+                    text = cache.get(rel, st.st_mtime_ns, st.st_size)
+                    if text is not None:
+                        self._put(("file_chunk", text))
+                    else:
+                        chunks: list[str] = []
+                        for chunk in read_text_streaming(p, self.w.cfg):
+                            if cancelled():
+                                return
+                            chunks.append(chunk)
+                            self._put(("file_chunk", chunk))
+                        cache.put(rel, st.st_mtime_ns, st.st_size, "".join(chunks))
+                self._put(("file_sep", None))
+                self._put(("progress", i))
+            if cache is not None:
+                cache.save()
+            self._put(("done", None))
         except Exception as e:
-            self.q.put(("error", str(e)))
+            self._put(("error", str(e)))
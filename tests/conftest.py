@@ -26,6 +26,17 @@ def qapp():
     return app
 
 
+@pytest.fixture(autouse=True)
+def user_cache_home(tmp_path_factory, monkeypatch) -> Path:
+    """
+    Каталог кешей пользователя (XDG_CACHE_HOME) — во временной папке:
+    сканирования в тестах не пишут кеш дампа в настоящий ~/.cache.
+    """
+    home = tmp_path_factory.mktemp("cache-home")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(home))
+    return home
+
+
 @pytest.fixture
 def sample_project_tree(tmp_path: Path) -> Path:
     """
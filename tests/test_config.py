@@ -47,3 +47,102 @@ def test_rc_path_constant_is_path() -> None:
     # просто sanity-check, что RC_PATH выглядит как файл в HOME
     assert isinstance(RC_PATH, Path)
     assert ".project_dumper.json" in RC_PATH.name
+
+
+def test_compiled_file_matcher_matches_fnmatch() -> None:
+    import fnmatch
+
+    cfg = Config()
+    matcher = cfg.compiled_file_matcher()
+    names = ["logo.png", "main.py", "cache.pyc", "data.sqlite3", ".gitignore", "README.md", "x.PNG"]
+    for name in names:
+        expected = any(fnmatch.fnmatch(name, pat) for pat in cfg.ignore_files)
+        assert bool(matcher.match(name)) is expected, name
+
+    # новый кортеж паттернов — новый матчер
+    cfg.ignore_files = ("*.md",)
+    assert cfg.compiled_file_matcher().match("README.md")
+    assert not cfg.compiled_file_matcher().match("logo.png")
+
+    cfg.ignore_files = ()
+    assert not cfg.compiled_file_matcher().match("anything")
+
+
+def test_ignore_dirs_set() -> None:
+    cfg = Config()
+    assert "node_modules" in cfg.ignore_dirs_set()
+    cfg.ignore_dirs = ("out",)
+    assert cfg.ignore_dirs_set() == frozenset({"out"})
+
+
+def test_load_defaults_memoized_until_file_changes(tmp_path: Path, monkeypatch) -> None:
+    rc = tmp_path / ".project_dumper.json"
+    monkeypatch.setattr("project_dumper.config.RC_PATH", rc, raising=True)
+
+    cfg = Config()
+    cfg.max_file_size = 1
+    save_defaults(cfg)
+
+    first = load_defaults()
+    first.max_file_size = 999  # мутация копии не портит кеш
+    second = load_defaults()
+    assert second.max_file_size == 1
+    assert second is not first
+
+    cfg.max_file_size = 2
+    save_defaults(cfg)
+    assert load_defaults().max_file_size == 2
+
+
+def test_load_defaults_ignores_unknown_keys(tmp_path: Path, monkeypatch) -> None:
+    rc = tmp_path / ".project_dumper.json"
+    monkeypatch.setattr("project_dumper.config.RC_PATH", rc, raising=True)
+    rc.write_text('{"no_such_option": 1, "ignore_dirs": ["a", "b"], "theme": "dark"}', encoding="utf-8")
+
+    cfg = load_defaults()
+    assert cfg.ignore_dirs == ("a", "b")
+    assert cfg.theme == "dark"
+    assert not hasattr(cfg, "no_such_option")
+
+
+def test_load_defaults_reuses_default_tuples(tmp_path: Path, monkeypatch) -> None:
+    rc = tmp_path / ".project_dumper.json"
+    monkeypatch.setattr("project_dumper.config.RC_PATH", rc, raising=True)
+    save_defaults(Config())
+
+    cfg = load_defaults()
+    assert cfg.ignore_dirs is Config().ignore_dirs
+    assert cfg.ignore_files is Config().ignore_files
+
+
+def test_load_defaults_falls_back_to_lenient_loader(tmp_path: Path, monkeypatch) -> None:
+    rc = tmp_path / ".project_dumper.json"
+    monkeypatch.setattr("project_dumper.config.RC_PATH", rc, raising=True)
+    # theme вне Literal: строгий разбор не пройдёт, остальные поля должны примениться
+    rc.write_text('{"theme": "blue", "max_file_size": 5}', encoding="utf-8")
+
+    cfg = load_defaults()
+    assert cfg.max_file_size == 5
+
+
+def test_config_roundtrip_without_msgspec(tmp_path: Path, monkeypatch) -> None:
+    rc = tmp_path / ".project_dumper.json"
+    monkeypatch.setattr("project_dumper.config.RC_PATH", rc, raising=True)
+    monkeypatch.setattr("project_dumper.config.msgspec", None, raising=True)
+
+    cfg = Config()
+    cfg.ignore_dirs = ("x", "y")
+    save_defaults(cfg)
+    assert load_defaults().ignore_dirs == ("x", "y")
+
+
+def test_is_file_and_dir_ignored() -> None:
+    cfg = Config()
+    cfg.ignore_files = ("*.log", "secret.txt")
+    cfg.ignore_dirs = ("build", "tmp*")
+    assert cfg.is_file_ignored("app.log")
+    assert cfg.is_file_ignored("secret.txt")
+    assert not cfg.is_file_ignored("main.py")
+    assert cfg.is_dir_ignored("build")
+    assert cfg.is_dir_ignored("tmp_cache")
+    assert not cfg.is_dir_ignored("src")
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 from project_dumper.diff_logic import (
+    DiffModel,
     DiffLineType,
+    classify_all,
     classify_line,
+    classify_lines_bytes,
+    detect_diff_block_bitmap,
+    detect_diff_block_bitmap_bytes,
     detect_diff_block_indices,
+    diff_header_rows,
     find_hunk_header_prefix,
+    first_chars,
     get_group_indices,
+    highlight_span,
     strip_for_copy,
+    strip_for_copy_many,
 )
 
 
@@ -30,6 +39,38 @@ def test_detect_diff_block_indices_basic() -> None:
     assert {5, 6, 7} <= indices
 
 
+def test_detect_diff_block_indices_accepts_text() -> None:
+    lines = [
+        "+x",                  # 0
+        "",                    # 1
+        "  diff --git a b",    # 2
+        "index 1..2",          # 3
+        "--- a",               # 4
+        "+++ b",               # 5
+        "@@ -1 +1 @@",         # 6
+    ]
+    # текст и список строк дают одинаковый результат
+    assert detect_diff_block_indices("\n".join(lines)) == detect_diff_block_indices(lines)
+    assert detect_diff_block_indices(lines) == {2, 3, 4, 5}
+
+
+def test_detect_diff_block_bitmap_matches_indices() -> None:
+    lines = ["diff --git a b", "i", "-", "+", "x", " diff y", "z"]
+    bm = detect_diff_block_bitmap(lines)
+    assert len(bm) == len(lines)
+    assert {i for i, v in enumerate(bm) if v} == detect_diff_block_indices(lines)
+    # классификация одинакова для set и битовой карты
+    indices = detect_diff_block_indices(lines)
+    for i in range(len(lines)):
+        assert classify_line(lines, i, bm) is classify_line(lines, i, indices)
+
+
+def test_diff_header_rows_marks_only_header_starts() -> None:
+    lines = ["diff --git a b", "i", "-", "+", "x", " diff y", "z"]
+    assert diff_header_rows(lines) == bytearray([1, 0, 0, 0, 0, 1, 0])
+    assert diff_header_rows("\n".join(lines)) == diff_header_rows(lines)
+
+
 def test_find_hunk_header_prefix_variants() -> None:
     line = "@@ -1,3 +1,4 @@ rest"
     sl = find_hunk_header_prefix(line)
@@ -76,6 +117,26 @@ def test_strip_for_copy_empty_hunk_headers() -> None:
     assert strip_for_copy("@@") == ""
     assert strip_for_copy("@@    @@") == ""
     assert strip_for_copy("   @@   @@   ") == ""
+    # текст после пар '@@' — уже не пустой хедер
+    assert strip_for_copy("@@ @@ more") == "more"
+
+
+def test_strip_for_copy_open_and_trailing_hunk_headers() -> None:
+    # открытый хедер: срезаются первые '@@' и следующий символ, как у обычного хедера
+    assert strip_for_copy("@@ text") == "text"
+    assert strip_for_copy("  @@ def f():") == "def f():"
+    assert strip_for_copy("@@ @@ text") == "text"
+    lines = ["@@ text", "@@ @@ text", "@@@"]
+    assert strip_for_copy_many(lines) == ["text", "text", ""]
+    assert DiffModel.from_lines(lines).copies == strip_for_copy_many(lines)
+    # тип строки — как у подсветки: открытый хедер — OTHER, с закрывающими '@@' — HEADER_HUNK
+    assert classify_line(lines, 0, set()) is DiffLineType.OTHER
+    assert classify_line(lines, 1, set()) is DiffLineType.HEADER_HUNK
+
+def test_strip_for_copy_many_matches_single() -> None:
+    lines = ["+++abc", "+@@ -1,3 @@ foo", "  @@ -1,3 @@ bar", "@@  @@", "", " ctx"]
+    assert strip_for_copy_many(lines) == [strip_for_copy(s) for s in lines]
+
 
 def test_get_group_indices_basic() -> None:
     lines = [
@@ -125,6 +186,14 @@ def test_get_group_indices_mixed_plus_minus() -> None:
     assert get_group_indices(lines, 1) == [1]
 
 
+def test_get_group_indices_with_first_chars_matches_scan() -> None:
+    lines = ["-a", "-b", " c", "\td", "", "+e", "+f", "x", "-g", " h"]
+    firsts = first_chars(lines)
+    assert len(firsts) == len(lines)
+    for i in range(len(lines)):
+        assert get_group_indices(lines, i, firsts) == get_group_indices(lines, i)
+
+
 def test_classify_line_priority() -> None:
     lines = [
         "diff --git a/x b/x",      # 0 HEADER_DIFF
@@ -163,4 +232,92 @@ def test_classify_empty_hunk_header() -> None:
     diff_indices: set[int] = set()
     assert classify_line(lines, 0, diff_indices) is DiffLineType.HEADER_HUNK_EMPTY
     assert classify_line(lines, 1, diff_indices) is DiffLineType.HEADER_HUNK_EMPTY
-    assert classify_line(lines, 2, diff_indices) is DiffLineType.HEADER_HUNK_EMPTY
\ No newline at end of file
+    assert classify_line(lines, 2, diff_indices) is DiffLineType.HEADER_HUNK_EMPTY
+
+def test_classify_lines_bytes_matches_classify_line() -> None:
+    lines = [
+        "diff --git a/x b/x",
+        "index 1..2",
+        "--- a/x",
+        "+++ b/x",
+        "@@ -1,2 +1,2 @@ def f():",
+        "-old",
+        "+новое",
+        " context",
+        "  @@   @@",
+    ]
+    buf = "\n".join(lines).encode("utf-8")
+    bm = detect_diff_block_bitmap(lines)
+    assert detect_diff_block_bitmap_bytes(buf) == bm
+    assert classify_lines_bytes(buf) == [classify_line(lines, i, bm) for i in range(len(lines))]
+
+
+def test_classify_open_and_trailing_hunk_headers() -> None:
+    lines = [
+        "@@ def f():",   # 0 открытый хедер — подсвечиваются только первые '@@'
+        "@@ @@ more",    # 1 пустой сегмент, но с текстом после
+        "@@@@",          # 2 пустой хедер
+    ]
+    diff_indices: set[int] = set()
+    assert classify_line(lines, 0, diff_indices) is DiffLineType.OTHER
+    assert classify_line(lines, 1, diff_indices) is DiffLineType.HEADER_HUNK
+    assert classify_line(lines, 2, diff_indices) is DiffLineType.HEADER_HUNK_EMPTY
+    assert classify_lines_bytes("\n".join(lines).encode()) == [
+        DiffLineType.OTHER, DiffLineType.HEADER_HUNK, DiffLineType.HEADER_HUNK_EMPTY,
+    ]
+
+
+def test_diff_model_matches_per_line_functions() -> None:
+    lines = [
+        "diff --git a/x b/x",
+        "index 1..2",
+        "--- a/x",
+        "+++ b/x",
+        "@@ -1,2 +1,2 @@ def f():",
+        "-old",
+        "-old2",
+        "+new",
+        " context",
+        "@@   @@",
+        "@@ open",
+    ]
+    model = DiffModel.from_lines(lines)
+    bm = detect_diff_block_bitmap(lines)
+    assert model.types == [classify_line(lines, i, bm) for i in range(len(lines))]
+    assert model.copies == [strip_for_copy(s) for s in lines]
+    assert model.firsts == first_chars(lines)
+    assert model.group_indices(5) == get_group_indices(lines, 5) == [5, 6]
+    assert model.spans == [highlight_span(s, t) for s, t in zip(lines, model.types)]
+
+
+def test_highlight_span_per_type() -> None:
+    assert highlight_span("+new", DiffLineType.PLUS) == (0, 4)
+    assert highlight_span("diff --git a b", DiffLineType.HEADER_DIFF) == (0, 14)
+    assert highlight_span("  @@ -1 +1 @@ def f():", DiffLineType.HEADER_HUNK) == (0, 13)
+    # открытый хедер: серые только первые '@@'
+    assert highlight_span("  @@ open", DiffLineType.OTHER) == (2, 2)
+    assert highlight_span(" context", DiffLineType.OTHER) is None
+
+
+def test_classify_all_matches_classify_line() -> None:
+    lines = [
+        "@@ -1 +1 @@",
+        "diff --git a/x b/x",
+        "--- a/x",
+        "+++ b/x",
+        "@@ @@",
+        "  @@ -2 +2 @@ ctx",
+        "@@ open",
+        "+add",
+        "-del",
+        "",
+        " ctx",
+    ]
+    bm = detect_diff_block_bitmap(lines)
+    assert classify_all(lines) == [classify_line(lines, i, bm) for i in range(len(lines))]
+    assert classify_all([]) == []
+
+
+def test_highlight_span_covers_every_type() -> None:
+    for t in DiffLineType:
+        highlight_span("@@", t)  # нет KeyError ни для одного типа
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import queue
+from pathlib import Path
+
+from project_dumper.config import Config
+import project_dumper.file_cache as file_cache
+import project_dumper.walker as walker
+from project_dumper.file_cache import FileCache, reader_key, user_cache_dir
+from project_dumper.walker import ScanThread, Walker
+
+
+def _run(root: Path, cache: FileCache) -> list[tuple[str, object]]:
+    q: "queue.Queue[tuple[str, object]]" = queue.Queue()
+    w = Walker()
+    thr = ScanThread(root, w, q, set(), set(), False, file_cache=cache)
+    thr.run()
+    return list(q.queue)
+
+
+def test_roundtrip_and_invalidation(tmp_path: Path) -> None:
+    key = reader_key(Config())
+    c = FileCache(tmp_path)
+    c.load(key)
+    c.put("a.txt", 1, 2, "hi")
+    c.save()
+    # файл — в каталоге кешей пользователя, сам проект не трогается
+    assert c.path.parent == user_cache_dir() and c.path.is_file()
+    assert list(tmp_path.iterdir()) == []
+
+    c2 = FileCache(tmp_path)
+    c2.load(key)
+    assert c2.get("a.txt", 1, 2) == "hi"
+    assert c2.get("a.txt", 1, 3) is None  # другой размер — запись устарела
+
+    c3 = FileCache(tmp_path)
+    c3.load(key[:-1] + [not key[-1]])  # другие настройки чтения
+    assert c3.get("a.txt", 1, 2) is None
+
+
+def test_save_drops_unseen_entries(tmp_path: Path) -> None:
+    key = reader_key(Config())
+    c = FileCache(tmp_path)
+    c.load(key)
+    c.put("a", 1, 1, "a")
+    c.put("b", 1, 1, "b")
+    c.save()
+    c.load(key)
+    c.get("a", 1, 1)
+    c.save()
+    c2 = FileCache(tmp_path)
+    c2.load(key)
+    assert c2.get("a", 1, 1) == "a"
+    assert c2.get("b", 1, 1) is None
+
+
+def test_cache_is_opt_in(sample_project_tree: Path) -> None:
+    assert Config().dump_cache is False
+    cache = FileCache(sample_project_tree)
+    _run(sample_project_tree, cache)
+    assert not cache.path.exists()
+
+
+def test_scan_thread_uses_cached_text(sample_project_tree: Path, monkeypatch) -> None:
+    monkeypatch.setattr(walker, "load_defaults", lambda: Config(dump_cache=True))
+    first = _run(sample_project_tree, FileCache(sample_project_tree))
+    calls: list[Path] = []
+    import project_dumper.reader as reader
+
+    orig = reader.read_text_streaming
+    monkeypatch.setattr(reader, "read_text_streaming", lambda p, cfg: (calls.append(p), orig(p, cfg))[1])
+    second = _run(sample_project_tree, FileCache(sample_project_tree))
+    assert calls == []
+    assert second == first
+
+    (sample_project_tree / "README.md").write_text("# changed, longer\n", encoding="utf-8")
+    third = _run(sample_project_tree, FileCache(sample_project_tree))
+    assert calls == [sample_project_tree / "README.md"]
+    assert ("file_chunk", "# changed, longer\n") in third
+
+
+def test_cache_file_is_per_root(tmp_path: Path) -> None:
+    key = reader_key(Config())
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir(); b.mkdir()
+    ca = FileCache(a, cache_dir=tmp_path / "cache")
+    ca.load(key)
+    ca.put("x", 1, 1, "from a")
+    ca.save()
+    cb = FileCache(b, cache_dir=tmp_path / "cache")
+    cb.load(key)
+    assert cb.path != ca.path
+    assert cb.get("x", 1, 1) is None
+
+
+def test_save_evicts_old_roots(tmp_path: Path, monkeypatch) -> None:
+    import os
+
+    monkeypatch.setattr(file_cache, "_MAX_ROOTS", 2)
+    key = reader_key(Config())
+    cache_dir = tmp_path / "cache"
+    caches = []
+    for i in range(3):
+        root = tmp_path / f"r{i}"
+        root.mkdir()
+        c = FileCache(root, cache_dir=cache_dir)
+        c.load(key)
+        c.put("x", 1, 1, "x")
+        c.save()
+        os.utime(c.path, ns=(i * 10**9, i * 10**9))
+        caches.append(c)
+    # третий корень вытеснил самый давний из каталога кешей
+    assert [c.path.exists() for c in caches] == [False, True, True]
+
+
+def test_save_caps_total_size(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(file_cache, "_MAX_ROOT_TEXT", 5)
+    key = reader_key(Config())
+    c = FileCache(tmp_path, cache_dir=tmp_path / "cache")
+    c.load(key)
+    c.put("a", 1, 1, "abc")
+    c.put("b", 1, 1, "def")
+    c.save()
+    c2 = FileCache(tmp_path, cache_dir=tmp_path / "cache")
+    c2.load(key)
+    assert c2.get("a", 1, 1) == "abc"
+    assert c2.get("b", 1, 1) is None
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import json
 
+import pytest
+
 from project_dumper.formatter import DumpBuilder, SEP
 
 
@@ -61,3 +63,96 @@ def test_dumpbuilder_sep_between_multiple_files() -> None:
 
     # Должен быть ровно один SEP между двумя файлами
     assert out.count(SEP) == 1
+
+
+def test_dumpbuilder_json_many_chunks() -> None:
+    b = DumpBuilder(mode="json")
+    b.set_tree("root")
+    b.start_file("a.py")
+    for i in range(100):
+        b.add_chunk(f"{i};")
+    b.end_file(is_last=False)
+    b.start_file("b.py")
+    b.add_chunk("B")
+    b.end_file(is_last=True)
+
+    obj = json.loads(b.build())
+    assert obj["files"][0]["content"] == "".join(f"{i};" for i in range(100))
+    assert obj["files"][1]["content"] == "B"
+
+
+def test_dumpbuilder_json_stdlib_fallback(monkeypatch) -> None:
+    # без orjson вывод собирается stdlib-энкодером и не отличается
+    def make() -> str:
+        b = DumpBuilder(mode="json")
+        b.set_tree("root/\n  файл.py")
+        b.start_file("файл.py")
+        b.add_chunk("print('привет')\n")
+        b.end_file(is_last=True)
+        return b.build()
+
+    fast = make()
+    monkeypatch.setattr("project_dumper.formatter.orjson", None)
+    slow = make()
+    assert fast == slow
+    assert json.loads(slow)["files"][0]["path"] == "файл.py"
+
+
+def test_dumpbuilder_close_reuses_clean_buffer() -> None:
+    first = DumpBuilder("txt")
+    first.set_tree("old/")
+    first.add_chunk("old content")
+    assert "old content" in first.build()
+    buf = first.buf
+    first.close()
+
+    second = DumpBuilder("txt")
+    assert second.buf is buf
+    second.set_tree("new/")
+    out = second.build()
+    assert "old" not in out
+    assert "new/" in out
+    second.close()
+    # закрытый builder не пишет в буфер, уже отданный в пул
+    with pytest.raises(RuntimeError):
+        second.add_chunk("late")
+    assert buf.getvalue() == ""
+
+
+def test_dumpbuilder_drain_returns_increments() -> None:
+    b = DumpBuilder("txt")
+    b.set_tree("proj/")
+    parts = [b.drain()]
+    b.start_file("a.py")
+    b.add_chunk("print(1)\n")
+    parts.append(b.drain())
+    assert b.drain() == ""
+    b.end_file(is_last=True)
+    parts.append(b.drain())
+    assert "".join(parts) == b.build()
+    assert DumpBuilder("json").drain() == ""
+
+
+def test_dumpbuilder_add_chunks_matches_add_chunk() -> None:
+    for mode in ("txt", "md", "json"):
+        one, many = DumpBuilder(mode=mode), DumpBuilder(mode=mode)
+        for b in (one, many):
+            b.set_tree("root/")
+            b.start_file("a.py")
+        for chunk in ("x = 1\n", "y = 2\n"):
+            one.add_chunk(chunk)
+        many.add_chunks(["x = 1\n", "y = 2\n"])
+        for b in (one, many):
+            b.end_file(is_last=True)
+        assert one.build() == many.build()
+
+
+def test_dumpbuilder_drain_limit_keeps_appending_at_end() -> None:
+    b = DumpBuilder(mode="txt")
+    b.start_file("a.py")
+    b.add_chunk("0123456789")
+    head = b.drain(4)
+    b.add_chunk("tail")
+    rest = b.drain()
+    assert head + rest == b.build()
+    assert b.drain() == ""
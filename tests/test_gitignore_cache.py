@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 from project_dumper.gitignore_cache import GitignoreCache
@@ -37,14 +38,152 @@ def test_gitignore_cache_changed_snapshot(tmp_path: Path) -> None:
 
     cache = GitignoreCache()
     cache.build(root)
-    # после первого build _snapshot заполнен, повторный build без изменений не должен менять ignored
-    before = dict(cache._snapshot)
+    # после первого build _parsed заполнен, повторный build без изменений не должен менять ignored
+    before = dict(cache._parsed)
+    assert cache.ignored(root / "a", is_dir=True) is True
+    rules_before = cache._dir_simple[""]
     cache.build(root)
-    after = dict(cache._snapshot)
+    after = dict(cache._parsed)
     assert before == after
+    # неизменённый .gitignore не перечитывается, правила каталога не пересобираются
+    assert after[gi][1] is before[gi][1]
+    assert cache._dir_simple[""] is rules_before
 
     # меняем .gitignore
     gi.write_text("a/\n*.tmp\n", encoding="utf-8")
+    mtime_ns = int(before[gi][0] * 10**9) + 10**9
+    os.utime(gi, ns=(mtime_ns, mtime_ns))
     cache.build(root)
-    # snapshot должен обновиться
-    assert dict(cache._snapshot) != before
+    # кеш разобранных строк должен обновиться
+    assert dict(cache._parsed) != before
+    assert "" not in cache._dir_simple
+    assert cache.ignored(root / "x.tmp", is_dir=False) is True
+    assert cache._dir_simple[""] is not rules_before
+
+
+def test_gitignore_cache_skips_ignored_dirs(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    (root / "node_modules" / "pkg").mkdir(parents=True)
+    (root / ".hidden").mkdir()
+    (root / "src").mkdir()
+    (root / "node_modules" / "pkg" / ".gitignore").write_text("*.py\n", encoding="utf-8")
+    (root / ".hidden" / ".gitignore").write_text("*.py\n", encoding="utf-8")
+    (root / "src" / ".gitignore").write_text("*.tmp\n", encoding="utf-8")
+
+    cache = GitignoreCache()
+    cache.build(root, frozenset({"node_modules"}), ignore_hidden=True)
+
+    # .gitignore из отброшенных каталогов не читаются вовсе
+    assert set(cache._parsed) == {root / "src" / ".gitignore"}
+
+
+def test_gitignore_cache_is_dir_hint(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / ".gitignore").write_text("build/\n", encoding="utf-8")
+
+    cache = GitignoreCache()
+    cache.build(root)
+
+    # подсказка is_dir избавляет от stat(); путь может даже не существовать
+    assert cache.ignored(root / "build", is_dir=True) is True
+    assert cache.ignored(root / "build", is_dir=False) is False
+
+
+def test_gitignore_cache_nested_gitignore_overrides_parent(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    (root / "sub" / "deep").mkdir(parents=True)
+    (root / "other").mkdir()
+    (root / ".gitignore").write_text("*.log\n/top.txt\n", encoding="utf-8")
+    (root / "sub" / ".gitignore").write_text("!keep.log\n/local.txt\n", encoding="utf-8")
+
+    cache = GitignoreCache()
+    cache.build(root)
+
+    assert cache.ignored(root / "a.log", is_dir=False) is True
+    assert cache.ignored(root / "sub" / "keep.log", is_dir=False) is False
+    assert cache.ignored(root / "sub" / "deep" / "keep.log", is_dir=False) is False
+    assert cache.ignored(root / "sub" / "x.log", is_dir=False) is True
+    assert cache.ignored(root / "other" / "keep.log", is_dir=False) is True
+    # шаблоны с '/' в начале привязаны к каталогу своего .gitignore
+    assert cache.ignored(root / "top.txt", is_dir=False) is True
+    assert cache.ignored(root / "sub" / "top.txt", is_dir=False) is False
+    assert cache.ignored(root / "sub" / "local.txt", is_dir=False) is True
+    assert cache.ignored(root / "local.txt", is_dir=False) is False
+    # PathSpec собран только для каталогов, под которыми проверялись пути
+    fresh = GitignoreCache()
+    fresh.build(root)
+    fresh.ignored(root / "a.log", is_dir=False)
+    assert set(fresh._dir_specs) == {""}
+
+
+def test_gitignore_cache_simple_patterns_skip_pathspec(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / ".gitignore").write_text("*.log\nbuild/\nsecret\n", encoding="utf-8")
+
+    cache = GitignoreCache()
+    cache.build(root)
+
+    assert cache.ignored(root / "a" / "x.log", is_dir=False) is True
+    assert cache.ignored(root / "build", is_dir=True) is True
+    assert cache.ignored(root / "build", is_dir=False) is False
+    assert cache.ignored(root / "a" / "secret", is_dir=False) is True
+    assert cache.ignored(root / "a" / "main.py", is_dir=False) is False
+    # одни расширения и имена — решаются множествами, PathSpec не собирается
+    assert cache._dir_specs == {}
+
+
+def test_gitignore_cache_ignored_many_matches_ignored(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    (root / "sub").mkdir(parents=True)
+    (root / ".gitignore").write_text("*.log\n/build/\n", encoding="utf-8")
+    (root / "sub" / ".gitignore").write_text("!keep.log\n**/gen/*.py\n", encoding="utf-8")
+
+    paths = [root / "a.log", root / "build", root / "sub" / "keep.log", root / "sub" / "x.log",
+             root / "sub" / "gen" / "m.py", root / "sub" / "m.py"]
+    are_dirs = [False, True, False, False, False, False]
+
+    single = GitignoreCache()
+    single.build(root)
+    batch = GitignoreCache()
+    batch.build(root)
+
+    expected = [single.ignored(p, is_dir=d) for p, d in zip(paths, are_dirs)]
+    assert batch.ignored_many(paths, are_dirs) == expected == [True, True, False, True, True, False]
+
+
+def test_gitignore_cache_excluded_dir_wins_over_negation(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    (root / "build" / "gen").mkdir(parents=True)
+    (root / ".gitignore").write_text("build/\n!keep.py\n", encoding="utf-8")
+    paths = [root / "build" / "keep.py", root / "build" / "gen" / "x.py", root / "keep.py"]
+    are_dirs = [False, False, False]
+
+    single = GitignoreCache()
+    single.build(root)
+    batch = GitignoreCache()
+    batch.build(root)
+
+    # как у git: файл внутри исключённого каталога отрицанием не возвращается
+    expected = [single.ignored(p, is_dir=d) for p, d in zip(paths, are_dirs)]
+    assert batch.ignored_many(paths, are_dirs) == expected == [True, True, False]
+    # решение по каталогу запомнено и дальше наследуется без проверки шаблонов
+    assert batch._results["build/"] is True
+
+
+def test_gitignore_cache_multi_dot_extension(tmp_path: Path) -> None:
+    root = tmp_path / "proj"
+    (root / "sub").mkdir(parents=True)
+    (root / ".gitignore").write_text("*.tar.gz\n*.min.js\n", encoding="utf-8")
+    paths = [root / "a.tar.gz", root / "b.min.js", root / "sub" / "c.tar.gz",
+             root / "d.gz", root / "e.js", root / "tar.gz", root / "x.y.min.js"]
+    expected = [True, True, True, False, False, False, True]
+
+    cache = GitignoreCache()
+    cache.build(root)
+    assert [cache.ignored(p, is_dir=False) for p in paths] == expected
+    # шаблоны простые — решение без PathSpec, и оно совпадает с ним
+    assert cache._dir_specs == {}
+    spec = cache._spec_for("")
+    assert [spec.match_file(p.relative_to(root).as_posix()) for p in paths] == expected
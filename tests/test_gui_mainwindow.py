@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from PyQt6 import QtWidgets
+from PyQt6 import QtCore, QtGui, QtWidgets
 
 from project_dumper.gui import MainWindow
 
@@ -47,3 +47,694 @@ def test_diff_scan_and_new(qapp) -> None:
     assert w.diff_text.isReadOnly() is False
     assert w._diff_lines == []
     assert w.diff_text.toPlainText() == ""
+
+
+def test_rebuild_tree_builds_nested_items(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w._rebuild_tree()
+
+    def names(item) -> dict:
+        return {item.child(r).text(): names(item.child(r)) for r in range(item.rowCount())}
+
+    root_item = w.tree_model.item(0)
+    assert names(root_item) == {
+        "src": {"utils": {"helpers.py": {}}, "main.py": {}},
+        "README.md": {},
+    }
+
+
+def test_rebuild_tree_applies_collapsed_dirs(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    utils = sample_project_tree / "src" / "utils"
+    w.collapsed_dirs.add(str(utils))
+    w._rebuild_tree()
+
+    src_idx = QtCore.QModelIndex(w._path_to_index[str(sample_project_tree / "src")])
+    utils_idx = QtCore.QModelIndex(w._path_to_index[str(utils)])
+    assert w.tree.isExpanded(src_idx)
+    assert not w.tree.isExpanded(utils_idx)
+
+
+def test_tree_toggle_keeps_model(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w._rebuild_tree()
+    src = sample_project_tree / "src"
+    src_item = w.tree_model.itemFromIndex(QtCore.QModelIndex(w._path_to_index[str(src)]))
+
+    w._on_tree_collapsed(src_item.index())
+    assert str(src) in w.collapsed_dirs
+    # дерево не пересобиралось: тот же элемент на том же месте
+    assert w.tree_model.itemFromIndex(QtCore.QModelIndex(w._path_to_index[str(src)])) is src_item
+
+
+def test_scan_delivers_dump_via_signals(qapp, sample_project_tree) -> None:
+    import time
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.scan()
+    deadline = time.monotonic() + 5
+    while "main.py" not in w.text.toPlainText() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    out = w.text.toPlainText()
+    assert "src/main.py" in out
+    assert "README.md" in out
+
+
+def test_collapsed_dir_is_populated_on_expand(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    utils = sample_project_tree / "src" / "utils"
+    w.collapsed_dirs.add(str(utils))
+    w._rebuild_tree()
+
+    utils_idx = QtCore.QModelIndex(w._path_to_index[str(utils)])
+    item = w.tree_model.itemFromIndex(utils_idx)
+    # содержимое свёрнутого каталога не читалось — только заглушка
+    assert [item.child(r).text() for r in range(item.rowCount())] == ["…"]
+
+    w.tree.expand(utils_idx)
+    assert [item.child(r).text() for r in range(item.rowCount())] == ["helpers.py"]
+    assert str(utils) not in w.collapsed_dirs
+
+
+def test_rebuild_tree_expands_each_dir_once(qapp, sample_project_tree, monkeypatch) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.collapsed_dirs.add(str(sample_project_tree / "src" / "utils"))
+    monkeypatch.setattr(w.tree, "expandAll", lambda: (_ for _ in ()).throw(AssertionError("expandAll")))
+    w._rebuild_tree()
+
+    def expanded(p) -> bool:
+        return w.tree.isExpanded(QtCore.QModelIndex(w._path_to_index[str(p)]))
+
+    assert expanded(sample_project_tree)
+    assert expanded(sample_project_tree / "src")
+    assert not expanded(sample_project_tree / "src" / "utils")
+
+
+def test_tree_toggles_are_debounced(qapp, sample_project_tree) -> None:
+    import time
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w._rebuild_tree()
+    before = w._scan_id
+    for name in ("src", "src/utils"):
+        idx = QtCore.QModelIndex(w._path_to_index[str(sample_project_tree / name)])
+        w._on_tree_collapsed(idx)
+    # сразу после кликов задание ещё не запущено
+    assert w._scan_id == before
+
+    deadline = time.monotonic() + 2
+    while w._scan_id == before and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert w._scan_id == before + 1
+
+
+def test_unchanged_dump_inputs_reuse_last_dump(qapp, sample_project_tree) -> None:
+    import time
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.scan()
+    deadline = time.monotonic() + 5
+    while w._last_dump is None and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert w._last_dump is not None
+
+    w._start_dump_job(sample_project_tree)
+    # без потока: текст восстановлен из кеша сразу
+    assert w.builder is not None and w.builder.buf is None
+    assert w.text.toPlainText() == w._last_dump
+
+
+def test_split_csv() -> None:
+    from project_dumper.gui import _split_csv
+
+    assert _split_csv(" .git ,node_modules,\n build , ,") == (".git", "node_modules", "build")
+    assert _split_csv("") == ()
+
+
+def test_save_to_file_writes_in_background(qapp, tmp_path, monkeypatch) -> None:
+    import time
+
+    w = MainWindow()
+    w.text.setPlainText("дамп проекта")
+    target = tmp_path / "dump.txt"
+    monkeypatch.setattr(
+        QtWidgets.QFileDialog, "getSaveFileName", staticmethod(lambda *a, **k: (str(target), ""))
+    )
+    w.save_to_file()
+    deadline = time.monotonic() + 5
+    while w._save_signals and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert target.read_text(encoding="utf-8") == "дамп проекта"
+    assert not w._save_signals
+
+
+def test_document_pieces_match_plain_text(qapp, monkeypatch) -> None:
+    from project_dumper import gui
+
+    doc = QtGui.QTextDocument()
+    doc.setPlainText("a\nbb\n\nccc\n")
+    monkeypatch.setattr(gui, "_SAVE_CHUNK", 3)
+    pieces = gui._document_pieces(doc)
+    assert len(pieces) > 1
+    assert "".join(pieces) == doc.toPlainText()
+    assert gui._document_pieces(QtGui.QTextDocument()) == [""]
+
+
+def test_save_to_file_uses_finished_dump(qapp, sample_project_tree, tmp_path, monkeypatch) -> None:
+    import time
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.scan()
+    deadline = time.monotonic() + 5
+    while not w._dump_complete and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert w._dump_complete
+
+    target = tmp_path / "dump.txt"
+    monkeypatch.setattr(
+        QtWidgets.QFileDialog, "getSaveFileName", staticmethod(lambda *a, **k: (str(target), ""))
+    )
+    # готовый дамп пишется из _last_dump, документ поля не копируется
+    monkeypatch.setattr(w.text, "toPlainText", lambda: (_ for _ in ()).throw(AssertionError))
+    w.save_to_file()
+    deadline = time.monotonic() + 5
+    while w._save_signals and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert target.read_text(encoding="utf-8") == w._last_dump
+
+
+def test_find_next_cycles_case_insensitive(qapp) -> None:
+    w = MainWindow()
+    w.text.setPlainText("alpha\nБета beta\nBETA")
+    w.search_edit.setText("beta")
+    starts = []
+    for _ in range(4):
+        w.find_next()
+        c = w.text.textCursor()
+        assert c.selectedText().lower() == "beta"
+        starts.append(c.selectionStart())
+    assert starts == [11, 16, 11, 16]
+
+
+def test_find_next_reuses_match_positions(qapp) -> None:
+    w = MainWindow()
+    w.text.setPlainText("aaa b aaa")
+    w.search_edit.setText("AA")
+    w.find_next()
+    matches = w._find_matches[2]
+    assert matches == [0, 1, 6, 7]
+    starts = [w.text.textCursor().selectionStart()]
+    for _ in range(2):
+        w.find_next()
+        starts.append(w.text.textCursor().selectionStart())
+    # запрос и документ те же — список совпадений не пересобирается
+    assert w._find_matches[2] is matches
+    assert starts == [0, 6, 0]
+    w.text.setPlainText("b aa")
+    w.find_next()
+    assert w._find_matches[2] == [2]
+
+
+def test_find_next_with_astral_chars(qapp) -> None:
+    w = MainWindow()
+    w.text.setPlainText("😀 x\nx")
+    w.search_edit.setText("x")
+    w.find_next()
+    assert w.text.textCursor().selectedText() == "x"
+    assert w.text.textCursor().selectionStart() == 3
+    # следующее — после эмодзи и в позициях документа, уже через список совпадений
+    w.find_next()
+    assert w.text.textCursor().selectionStart() == 5
+    assert w._find_matches[2] == [2, 4]
+    w.find_next()
+    assert w.text.textCursor().selectionStart() == 3
+
+
+def test_double_click_toggles_excluded_style(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w._rebuild_tree()
+    root_item = w.tree_model.item(0)
+    readme = next(root_item.child(r) for r in range(root_item.rowCount()) if root_item.child(r).text() == "README.md")
+
+    w._on_tree_double_clicked(readme.index())
+    assert str(sample_project_tree / "README.md") in w.excluded_files
+    assert readme.font().strikeOut()
+
+    w._on_tree_double_clicked(readme.index())
+    assert not w.excluded_files
+    assert not readme.font().strikeOut()
+
+
+def test_apply_theme_skips_unchanged_palette(qapp, monkeypatch) -> None:
+    from project_dumper import gui
+
+    w = MainWindow()
+    calls: list[str] = []
+    monkeypatch.setattr(gui, "_apply_dark_palette", lambda app: calls.append("dark"))
+    monkeypatch.setattr(gui, "_apply_light_palette", lambda app: calls.append("light"))
+
+    w._apply_theme("dark")
+    w._apply_theme("dark")
+    w._apply_theme("light")
+    assert calls == ["dark", "light"]
+    # палитра собирается один раз
+    assert gui._dark_palette() is gui._dark_palette()
+
+
+def test_validate_root(tmp_path) -> None:
+    from project_dumper.gui import _validate_root
+
+    f = tmp_path / "file.txt"
+    f.write_text("x", encoding="utf-8")
+    assert _validate_root(str(tmp_path)) == tmp_path
+    assert _validate_root(str(f)) is None
+    assert _validate_root(str(tmp_path / "missing")) is None
+
+
+def test_rebuild_tree_unblocks_signals_on_error(qapp, sample_project_tree, monkeypatch) -> None:
+    import pytest
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+
+    def boom(*a, **k):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(w, "_fill_tree", boom)
+    with pytest.raises(RuntimeError):
+        w._rebuild_tree()
+    assert not w.tree.signalsBlocked()
+
+    w.path_edit.setText(str(sample_project_tree / "missing"))
+    w._rebuild_tree()
+    assert not w.tree.signalsBlocked()
+
+
+def test_new_scan_cancels_running_one(qapp, sample_project_tree) -> None:
+    import time
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.scan()
+    first_cancel, first_thread = w._scan_cancel, w._scan_thread
+    w.scan()
+    assert w._scan_cancel is not first_cancel
+    # прошлый запуск либо уже завершился, либо получил отмену
+    assert first_cancel.is_set() or not first_thread.is_alive()
+    deadline = time.monotonic() + 5
+    while not w._dump_complete and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert "src/main.py" in w._last_dump
+
+
+def test_diff_highlighter_reuses_formats_per_theme(qapp) -> None:
+    w = MainWindow()
+    w.diff_highlighter.set_theme("light")
+    w.diff_text.setPlainText("+added\n-removed\n")
+    hl = w.diff_highlighter
+    hl.rehighlight()
+    plus_fmt = hl._fmt_plus
+
+    def plus_color() -> tuple[int, int, int]:
+        rng = w.diff_text.document().findBlockByNumber(0).layout().formats()[0]
+        c = rng.format.foreground().color()
+        return c.red(), c.green(), c.blue()
+
+    assert plus_color() == (0, 180, 0)
+    w.diff_highlighter.set_theme("dark")
+    hl.rehighlight()
+    assert hl._fmt_plus is plus_fmt
+    assert plus_color() == (144, 238, 144)
+
+
+def test_diff_highlighter_updates_lines_incrementally(qapp) -> None:
+    from PyQt6 import QtGui
+
+    w = MainWindow()
+    w.diff_highlighter.set_theme("light")
+    w.diff_text.setPlainText("a\n+b\n+c\n+d\n+e")
+    hl = w.diff_highlighter
+    hl.rehighlight()
+    lines = hl._lines
+
+    def color(block_no: int) -> tuple[int, int, int]:
+        rng = w.diff_text.document().findBlockByNumber(block_no).layout().formats()[0]
+        c = rng.format.foreground().color()
+        return c.red(), c.green(), c.blue()
+
+    cursor = QtGui.QTextCursor(w.diff_text.document())
+    cursor.insertText("diff --git a/x b/x\n")
+    # правка одной строки: копия обновлена на месте, без полной пересборки
+    assert hl._lines is lines
+    assert lines == ["diff --git a/x b/x", "a", "+b", "+c", "+d", "+e"]
+    # блок заголовка сдвинул подсветку и на следующие строки, хоть их текст не менялся
+    assert color(3) == (140, 140, 140)
+    assert color(4) == (0, 180, 0)
+
+
+def test_diff_flash_paints_visible_lines(qapp) -> None:
+    w = MainWindow()
+    w.show()
+    w.diff_text.setPlainText("\n".join(f" line {i}" for i in range(2000)))
+    qapp.processEvents()
+    w._start_diff_flash([0, 1, 1999])
+    w._diff_flash_groups[0][0] -= 40  # группе уже 40 мс
+    w._update_diff_flash()
+    # подсветка рисуется самим полем, без ExtraSelection
+    assert w.diff_text.extraSelections() == []
+    (lines, alpha), = w.diff_text._flash
+    assert list(lines) == [0, 1, 1999] and 0 < alpha < 255
+    img = w.diff_text.viewport().grab().toImage()
+    first = w.diff_text.blockBoundingGeometry(w.diff_text.document().firstBlock())
+    y = int(first.translated(w.diff_text.contentOffset()).center().y())
+    pixel = img.pixelColor(img.width() - 5, y)
+    assert pixel.blue() < pixel.red() and pixel.blue() < pixel.green()  # жёлтый оттенок
+    # повторное копирование строки переносит её в новую группу
+    w._start_diff_flash([1])
+    (old_start, old_lines), (new_start, new_lines) = w._diff_flash_groups
+    assert (list(old_lines), list(new_lines)) == ([0, 1999], [1])
+    assert new_start - old_start >= 40
+    w.close()
+
+
+def test_diff_flash_repaints_only_when_changed(qapp, monkeypatch) -> None:
+    w = MainWindow()
+    w.show()
+    w.diff_text.setPlainText("\n".join(f"+line {i}" for i in range(2000)))
+    qapp.processEvents()
+    updates: list[QtGui.QRegion] = []
+    vp = w.diff_text.viewport()
+    orig = vp.update
+    monkeypatch.setattr(vp, "update", lambda *a: (updates.append(a[0] if a else None), orig(*a)))
+
+    class Clock:
+        now = 1000
+
+        def elapsed(self) -> int:
+            return self.now
+
+    w._diff_flash_clock = Clock()  # замороженные часы: кадры различаются только сдвигом старта
+    w._start_diff_flash([1998, 1999])  # обе строки за пределами экрана
+    w._diff_flash_groups[-1][0] -= 40
+    w._update_diff_flash()
+    assert updates == []
+    w._start_diff_flash([0])
+    w._update_diff_flash()
+    w._update_diff_flash()  # тот же кадр
+    w._diff_flash_groups[-1][0] -= 40
+    w._update_diff_flash()
+    # перерисовывается только полоса строки 0, а не весь экран
+    assert len(updates) == 2
+    assert all(r.boundingRect().height() < vp.height() // 4 for r in updates)
+    w.close()
+
+
+def test_diff_flash_animation_clears_when_finished(qapp) -> None:
+    import time
+
+    w = MainWindow()
+    w.show()
+    w.w.cfg.diff_copy_flash_duration_ms = 60
+    w.diff_text.setPlainText("+a\n+b")
+    qapp.processEvents()
+    w._start_diff_flash([0, 1])
+    assert w._diff_flash_anim.state() == QtCore.QAbstractAnimation.State.Running
+    deadline = time.monotonic() + 5
+    while w._diff_flash_groups and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    assert w._diff_flash_groups == []
+    assert w.diff_text._flash == []
+    w.close()
+
+
+def test_rebuild_tree_inserts_subtree_in_one_batch(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    inserted: list[tuple[int, int]] = []
+    w.tree_model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    w._rebuild_tree()
+    # корень и весь его верхний уровень с готовыми поддеревьями
+    assert len(inserted) == 2
+    assert str(sample_project_tree / "src" / "utils") in w._path_to_index
+
+
+def test_tree_items_carry_dir_flag(qapp, sample_project_tree) -> None:
+    from project_dumper.gui import _IS_DIR_ROLE
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w._rebuild_tree()
+    root_item = w.tree_model.item(0)
+    kinds = {
+        root_item.child(r).text(): root_item.child(r).data(_IS_DIR_ROLE)
+        for r in range(root_item.rowCount())
+    }
+    assert kinds == {"src": True, "README.md": None}
+    # двойной клик по каталогу ничего не исключает
+    src = next(root_item.child(r) for r in range(root_item.rowCount()) if root_item.child(r).text() == "src")
+    w._on_tree_double_clicked(src.index())
+    assert not w.excluded_files
+
+
+def test_scan_signals_wake_once_per_batch(qapp) -> None:
+    from project_dumper.gui import _ScanSignals
+
+    bridge = _ScanSignals(7)
+    wakes: list[int] = []
+    bridge.ready.connect(wakes.append)
+    bridge.put(("file_chunk", "a"))
+    bridge.put(("file_chunk", "b"))
+    bridge.put(("progress", 1))
+    assert wakes == [7]
+    assert bridge.take() == [("file_chunk", "a"), ("file_chunk", "b"), ("progress", 1)]
+    bridge.put(("done", None))
+    assert wakes == [7, 7]
+
+
+def test_dump_tail_is_inserted_in_slices(qapp) -> None:
+    import time
+    from project_dumper.gui import _FLUSH_CHARS
+
+    w = MainWindow()
+    tail = "x" * (2 * _FLUSH_CHARS + 10)
+    w._dump_tail, w._dump_tail_pos = tail, 0
+    w._flush_dump_text()
+    # за тик — не больше _FLUSH_CHARS, остаток досылает таймер
+    assert w.text.document().characterCount() - 1 == _FLUSH_CHARS
+    assert w._dump_flush_timer.isActive()
+    deadline = time.monotonic() + 5
+    while w._dump_tail and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert w.text.toPlainText() == tail
+
+
+def test_schedule_rehighlight_runs_in_batches(qapp) -> None:
+    import time
+    from project_dumper.gui import _REHIGHLIGHT_BATCH
+
+    w = MainWindow()
+    w.diff_highlighter.set_theme("light")
+    n = _REHIGHLIGHT_BATCH * 3
+    w.diff_text.setPlainText("\n".join("+x" for _ in range(n)))
+    hl = w.diff_highlighter
+    doc = w.diff_text.document()
+
+    def green(block_no: int) -> int:
+        return doc.findBlockByNumber(block_no).layout().formats()[0].format.foreground().color().green()
+
+    w.diff_highlighter.set_theme("dark")
+    hl.schedule_rehighlight(start_block=_REHIGHLIGHT_BATCH)
+    # первая пачка — сразу и с указанного блока, остальное — из цикла событий
+    assert green(_REHIGHLIGHT_BATCH) == 238
+    assert green(0) == 180
+    assert hl._rh_timer.isActive()
+    deadline = time.monotonic() + 5
+    while hl._rh_left and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.001)
+    assert green(0) == 238 and green(n - 1) == 238
+
+
+def test_large_paste_highlight_is_deferred(qapp) -> None:
+    import time
+    from project_dumper.gui import _REHIGHLIGHT_BATCH
+
+    w = MainWindow()
+    w.diff_text.setPlainText("+a\n-b")
+    doc = w.diff_text.document()
+    hl = w.diff_highlighter
+    cursor = QtGui.QTextCursor(doc)
+    cursor.movePosition(QtGui.QTextCursor.MoveOperation.End)
+    cursor.insertText("\n" + "\n".join("+x" for _ in range(_REHIGHLIGHT_BATCH * 2)))
+    # вставленные блоки ещё без форматов, старые — как были
+    assert hl._defer_timer.isActive()
+    assert doc.findBlockByNumber(5).layout().formats() == []
+    assert doc.findBlockByNumber(0).layout().formats()
+    deadline = time.monotonic() + 5
+    while (hl._defer_timer.isActive() or hl._rh_timer.isActive()) and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert hl._defer_range is None
+    assert doc.findBlockByNumber(5).layout().formats()
+    assert doc.lastBlock().layout().formats()
+
+
+def test_scan_skips_tree_rebuild_when_unchanged(qapp, sample_project_tree, monkeypatch) -> None:
+    import os
+
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.scan()
+    rebuilds: list[object] = []
+    orig = w._rebuild_tree
+    monkeypatch.setattr(w, "_rebuild_tree", lambda root=None: (rebuilds.append(root), orig(root)))
+    w.scan()
+    assert rebuilds == []
+    # новый файл в корне меняет mtime каталога
+    (sample_project_tree / "new.txt").write_text("x", encoding="utf-8")
+    st = os.stat(sample_project_tree)
+    os.utime(sample_project_tree, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    w.scan()
+    assert len(rebuilds) == 1
+    w.excluded_files.add(str(sample_project_tree / "README.md"))
+    w.scan()
+    assert len(rebuilds) == 2
+    w._cancel_scan()
+
+
+def test_apply_theme_pushes_theme_to_highlighter(qapp) -> None:
+    w = MainWindow()
+    w._current_theme = "light"
+    w.diff_highlighter.set_theme("light")
+    w._apply_theme("dark")
+    assert w.diff_highlighter._theme_name == "dark"
+    assert w.diff_highlighter._fmt_plus.foreground().color().green() == 238
+    w._apply_theme("light")
+
+
+def test_group_modifier_matches_exact_mask(qapp) -> None:
+    w = MainWindow()
+    KM = QtCore.Qt.KeyboardModifier
+    ctrl, shift, alt = KM.ControlModifier, KM.ShiftModifier, KM.AltModifier
+    w.w.cfg.diff_group_modifier = "Ctrl+Shift"
+    assert w._is_group_modifier_pressed(ctrl | shift) is True
+    assert w._is_group_modifier_pressed(ctrl | shift | KM.KeypadModifier) is True
+    assert w._is_group_modifier_pressed(ctrl) is False
+    assert w._is_group_modifier_pressed(ctrl | shift | alt) is False
+    w.w.cfg.diff_group_modifier = "nonsense"
+    assert w._is_group_modifier_pressed(ctrl) is True
+    assert w._is_group_modifier_pressed(KM.NoModifier) is False
+
+
+def test_diff_highlight_suspended_above_size_limit(qapp) -> None:
+    import time
+    from project_dumper.gui import _REHIGHLIGHT_BATCH
+
+    w = MainWindow()
+    hl = w.diff_highlighter
+    doc = w.diff_text.document()
+    w.w.cfg.diff_highlight_max_chars = 1000
+    w.diff_text.setPlainText("\n".join("+x" for _ in range(_REHIGHLIGHT_BATCH * 2)))
+    qapp.processEvents()
+    # документ не помещается: подсветка отключена, кнопка видна, форматов нет
+    assert hl.document() is None
+    assert not w.diff_highlight_btn.isHidden()
+    assert doc.findBlockByNumber(5).layout().formats() == []
+
+    hl.highlight_anyway()
+    assert hl.document() is doc
+    assert w.diff_highlight_btn.isHidden()
+    deadline = time.monotonic() + 5
+    while (hl._defer_timer.isActive() or hl._rh_timer.isActive()) and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert doc.findBlockByNumber(5).layout().formats()
+    assert doc.lastBlock().layout().formats()
+
+    # очищенное поле помещается — ручное включение больше не нужно
+    w.diff_new()
+    assert hl.document() is doc and hl._forced is False
+    w.diff_text.setPlainText("+" * 2000)
+    assert hl.document() is None
+
+
+def _finish_scan(qapp, w) -> None:
+    import time
+
+    w.scan()
+    deadline = time.monotonic() + 5
+    while not w._dump_complete and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert w._dump_complete
+
+
+def test_copy_all_after_clear_has_nothing_to_copy(qapp, sample_project_tree, monkeypatch) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    _finish_scan(qapp, w)
+    shown: list[str] = []
+    monkeypatch.setattr(QtWidgets.QMessageBox, "information", staticmethod(lambda _w, _t, msg: shown.append(msg)))
+    QtWidgets.QApplication.clipboard().setText("до копирования")
+    w.clear_btn.click()
+    assert w.text.toPlainText() == ""
+    w.copy_all()
+    assert shown == ["Нечего копировать"]
+    assert QtWidgets.QApplication.clipboard().text() == "до копирования"
+
+
+def test_save_to_file_after_clear_has_nothing_to_save(qapp, sample_project_tree, tmp_path, monkeypatch) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    _finish_scan(qapp, w)
+    shown: list[str] = []
+    monkeypatch.setattr(QtWidgets.QMessageBox, "information", staticmethod(lambda _w, _t, msg: shown.append(msg)))
+    target = tmp_path / "dump.txt"
+    monkeypatch.setattr(
+        QtWidgets.QFileDialog, "getSaveFileName", staticmethod(lambda *a, **k: (str(target), ""))
+    )
+    w.clear_btn.click()
+    w.save_to_file()
+    assert shown == ["Нечего сохранять"]
+    assert not w._save_signals and not target.exists()
+
+
+def test_new_scan_does_not_share_walker_with_cancelled_thread(qapp, sample_project_tree) -> None:
+    w = MainWindow()
+    w.path_edit.setText(str(sample_project_tree))
+    w.scan()
+    old = w._scan_thread
+    w._start_dump_job(sample_project_tree, force=True)
+    new = w._scan_thread
+    # брошенный поток может ещё работать: кеш .gitignore у каждого запуска свой
+    assert old is not None and new is not old
+    assert old.w is not new.w and old.w.git is not new.w.git
+    assert new.w is not w.w and new.w.git is not w.w.git
+    import time
+
+    deadline = time.monotonic() + 5
+    while not w._dump_complete and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert w._dump_complete
+    # после "done" окно берёт собранный потоком кеш для дерева
+    assert w.w.git is new.w.git
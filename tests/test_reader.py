@@ -46,3 +46,93 @@ def test_read_text_streaming_binary_detected(tmp_path: Path) -> None:
     chunks = list(read_text_streaming(p, cfg, chunk_size=64))
     assert len(chunks) == 1
     assert "binary content detected" in chunks[0]
+
+
+
+def test_read_text_streaming_skips_binary_extension(tmp_path: Path) -> None:
+    # содержимое текстовое, но по расширению файл не читается
+    p = tmp_path / "logo.PNG"
+    p.write_text("not really an image", encoding="utf-8")
+    assert list(read_text_streaming(p, Config())) == ["[SKIPPED: binary by extension]"]
+
+def test_is_binary_sample_threshold() -> None:
+    # 3 управляющих байта из 10: ровно на пороге — ещё текст, выше — бинарь
+    data = b"\x01\x02\x03abcdefg"
+    assert is_binary_sample(data, threshold=0.3) is False
+    assert is_binary_sample(data, threshold=0.29) is True
+    assert is_binary_sample(b"", threshold=0.3) is False
+
+
+def test_is_binary_sample_threshold_one_skips_ratio() -> None:
+    assert is_binary_sample(b"\x01\x02\x03", threshold=1.0) is False
+    assert is_binary_sample(b"\x01\x00", threshold=1.0) is True  # NUL решает при любом пороге
+
+
+def test_read_text_streaming_sniffs_bounded_window(tmp_path: Path, monkeypatch) -> None:
+    import project_dumper.reader as reader
+
+    if reader.from_bytes is None:
+        return
+    text = "Съешь же ещё этих мягких французских булок, да выпей чаю. Широкая электрификация южных губерний.\n" * 200
+    p = tmp_path / "cp1251.txt"
+    p.write_bytes(text.encode("cp1251"))
+    seen: list[int] = []
+    orig = reader.from_bytes
+    monkeypatch.setattr(reader, "from_bytes", lambda data: (seen.append(len(data)), orig(data))[1])
+
+    cfg = Config()
+    cfg.errors_policy = "strict"
+    out = "".join(read_text_streaming(p, cfg))
+    assert seen and max(seen) <= reader._SNIFF_BYTES
+    assert out[:60] == text[:60]
+    assert len(out) == len(text) and out == text
+
+
+def test_read_text_streaming_keeps_chars_across_chunks(tmp_path: Path) -> None:
+    # кусок в 5 байт рвёт двухбайтные символы UTF-8 — строгий режим не должен падать
+    text = "жжжжжжжжжж\nёлка"
+    p = tmp_path / "utf8.txt"
+    p.write_bytes(text.encode("utf-8"))
+    cfg = Config()
+    cfg.errors_policy = "strict"
+    assert "".join(read_text_streaming(p, cfg, chunk_size=5)) == text
+
+
+def test_read_text_streaming_maps_large_files(tmp_path: Path, monkeypatch) -> None:
+    import project_dumper.reader as reader
+
+    text = "строка с юникодом 🙂\n" * 2000
+    p = tmp_path / "big.txt"
+    p.write_bytes(text.encode("utf-8"))
+    cfg = Config()
+    cfg.errors_policy = "strict"
+    mapped: list[int] = []
+    real_mmap = reader.mmap.mmap
+    monkeypatch.setattr(reader, "_MMAP_MIN_SIZE", 4096)
+    monkeypatch.setattr(reader.mmap, "mmap", lambda *a, **kw: (mapped.append(1), real_mmap(*a, **kw))[1])
+    assert "".join(read_text_streaming(p, cfg, chunk_size=1000)) == text
+    assert mapped
+
+
+def test_read_text_streaming_ascii_fast_path_hands_over_to_decoder(tmp_path: Path) -> None:
+    # ASCII-начало идёт мимо декодера, а символ на стыке кусков после него — уже через декодер
+    text = "ascii only\n" * 3 + "жжж"
+    p = tmp_path / "mixed.txt"
+    p.write_bytes(text.encode("utf-8"))
+    cfg = Config()
+    cfg.errors_policy = "strict"
+    for size in (5, 7, 16, 1024):
+        assert "".join(read_text_streaming(p, cfg, chunk_size=size)) == text
+
+
+def test_read_text_streaming_redetects_when_sniff_is_misleading(tmp_path: Path) -> None:
+    # первые 8 КБ — чистый ASCII, кириллица cp1251 только дальше: кодировка по началу
+    # ("ascii") кусок целиком не декодирует, и детектор смотрит весь кусок
+    text = "x = 1\n" * 1400 + "Съешь же ещё этих мягких французских булок, да выпей чаю. " * 40
+    p = tmp_path / "late_cp1251.txt"
+    p.write_bytes(text.encode("cp1251"))
+    cfg = Config()
+    cfg.errors_policy = "strict"
+    out = "".join(read_text_streaming(p, cfg))
+    assert out[:60] == text[:60]
+    assert out == text
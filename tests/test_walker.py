@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 from project_dumper.config import Config
-from project_dumper.walker import Walker
+from project_dumper.walker import ScanThread, Walker
 
 
 def test_skip_dir_and_file(sample_project_tree: Path) -> None:
@@ -53,3 +54,155 @@ def test_iter_files(sample_project_tree: Path) -> None:
     assert "README.md" in rels
     assert "src/main.py" in rels
     assert "src/utils/helpers.py" in rels
+
+
+
+def test_iter_files_walks_nested_dirs(sample_project_tree: Path) -> None:
+    for i in range(5):
+        deep = sample_project_tree / f"pkg{i}" / "sub" / "leaf"
+        deep.mkdir(parents=True)
+        (deep / f"m{i}.py").write_text("x = 1\n", encoding="utf-8")
+    (sample_project_tree / "node_modules" / "lib").mkdir(parents=True)
+    (sample_project_tree / "node_modules" / "lib" / "index.js").write_text("", encoding="utf-8")
+    os.symlink(sample_project_tree / "src", sample_project_tree / "src_link")
+    w = Walker()
+    w.cfg = Config()
+    files = w.iter_files(sample_project_tree)
+    rels = [f.relative_to(sample_project_tree).as_posix() for f in files]
+    assert rels == sorted(rels, key=str.lower)
+    assert len(rels) == 3 + 5
+    assert "pkg3/sub/leaf/m3.py" in rels
+    # ссылка на каталог без follow_symlinks не обходится, ignore_dirs отсекаются
+    assert not any(r.startswith(("node_modules/", "src_link/")) for r in rels)
+
+def test_list_entries_typed_reports_dirs(sample_project_tree: Path) -> None:
+    w = Walker()
+    w.cfg = Config()
+    typed = w.list_entries_typed(sample_project_tree)
+    assert [p for p, _ in typed] == w.list_entries(sample_project_tree)
+    assert dict((p.name, d) for p, d in typed) == {"src": True, "README.md": False}
+
+
+
+
+def test_list_entries_typed_skips_symlinks_unless_followed(sample_project_tree: Path) -> None:
+    os.symlink(sample_project_tree / "src", sample_project_tree / "src_link")
+    os.symlink(sample_project_tree / "README.md", sample_project_tree / "readme_link.md")
+    w = Walker()
+    w.cfg = Config()
+    assert [p.name for p, _ in w.list_entries_typed(sample_project_tree)] == ["src", "README.md"]
+    w.cfg.follow_symlinks = True
+    typed = dict((p.name, d) for p, d in w.list_entries_typed(sample_project_tree))
+    assert typed == {"src": True, "src_link": True, "README.md": False, "readme_link.md": False}
+
+def test_filter_checks_gitignore_only_for_name_survivors(sample_project_tree: Path) -> None:
+    w = Walker()
+    w.cfg = Config()
+    seen: list[list[str]] = []
+    orig = w.git.ignored_many
+    w.git.ignored_many = lambda paths, are_dirs: (seen.append([p.name for p in paths]), orig(paths, are_dirs))[1]
+    out = w._filter(sample_project_tree, [(".git", True), ("node_modules", True), ("src", True), ("README.md", False)])
+    assert out == [
+        ("src", sample_project_tree / "src", True),
+        ("README.md", sample_project_tree / "README.md", False),
+    ]
+    assert seen == [["src", "README.md"]]
+
+
+def test_build_tree_draws_nested_branches(sample_project_tree: Path) -> None:
+    (sample_project_tree / "src" / "utils" / "deep").mkdir()
+    (sample_project_tree / "src" / "utils" / "deep" / "x.py").write_text("", encoding="utf-8")
+    w = Walker()
+    w.cfg = Config()
+    assert w.build_tree(sample_project_tree).splitlines() == [
+        sample_project_tree.name + "/",
+        "├── src",
+        "│   ├── utils",
+        "│   │   ├── deep",
+        "│   │   │   └── x.py",
+        "│   │   └── helpers.py",
+        "│   └── main.py",
+        "└── README.md",
+    ]
+
+def test_build_tree_accepts_str_and_path_states(sample_project_tree: Path) -> None:
+    w = Walker()
+    w.cfg = Config()
+    utils = sample_project_tree / "src" / "utils"
+    readme = sample_project_tree / "README.md"
+    by_str = w.build_tree(sample_project_tree, {str(utils)}, {str(readme)})
+    assert w.build_tree(sample_project_tree, {utils}, {readme}) == by_str
+    assert "helpers.py" not in by_str
+    assert "README.md" not in by_str
+
+
+def test_scan_thread_stops_on_cancel(sample_project_tree: Path) -> None:
+    import threading
+
+    cancel = threading.Event()
+    kinds: list[str] = []
+
+    class Out:
+        def put(self, item) -> None:
+            kinds.append(item[0])
+            if item[0] == "file_header":
+                cancel.set()  # отмена посреди обхода
+
+    w = Walker()
+    w.cfg = Config()
+    thr = ScanThread(sample_project_tree, w, Out(), set(), set(), False, cancel=cancel)
+    thr.start()
+    thr.join(timeout=5)
+    assert not thr.is_alive()
+    assert kinds.count("file_header") == 1
+    assert "done" not in kinds
+
+
+def test_scan_thread_batches_for_put_many(sample_project_tree: Path) -> None:
+    batches: list[list[tuple[str, object]]] = []
+
+    class Out:
+        def put(self, item) -> None:
+            raise AssertionError("put() при наличии put_many")
+
+        def put_many(self, items) -> None:
+            batches.append(list(items))
+
+    w = Walker()
+    w.cfg = Config()
+    thr = ScanThread(sample_project_tree, w, Out(), set(), set(), False)
+    thr.start()
+    thr.join(timeout=5)
+    kinds = [k for b in batches for k, _ in b]
+    # дерево уходит отдельной пачкой, "done" — последним
+    assert batches[0] == [batches[0][0]] and kinds[0] == "tree"
+    assert kinds[-1] == "done"
+    assert len(batches) < len(kinds)
+
+
+def test_legacy_cache_dir_is_ignored_by_default(sample_project_tree: Path) -> None:
+    (sample_project_tree / ".project_dumper").mkdir()
+    (sample_project_tree / ".project_dumper" / "dump-cache.json").write_text("{}", encoding="utf-8")
+    w = Walker()
+    w.cfg = Config()
+    w.cfg.ignore_hidden = False
+    assert ".project_dumper" not in [p.name for p in w.list_entries(sample_project_tree)]
+    # это обычная запись ignore_dirs: убрав её, пользователь увидит каталог
+    w.cfg.ignore_dirs = tuple(d for d in w.cfg.ignore_dirs if d != ".project_dumper")
+    assert ".project_dumper" in [p.name for p in w.list_entries(sample_project_tree)]
+
+
+def test_walks_stop_on_cancel(sample_project_tree: Path) -> None:
+    import threading
+
+    cancel = threading.Event()
+    cancel.set()
+    w = Walker()
+    w.cfg = Config()
+    # до первого каталога: в дереве только корень и его записи, файлов нет
+    assert w.build_tree(sample_project_tree, cancel=cancel).splitlines() == [
+        sample_project_tree.name + "/", "├── src",
+    ]
+    assert w.iter_files(sample_project_tree, cancel=cancel) == []
+    w.git.build(sample_project_tree, cancel=cancel)
+    assert w.git.root == sample_project_tree and w.git._dir_lines == {}